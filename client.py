@@ -3,21 +3,32 @@
 Fixed MCP Client Test - With proper JSON-RPC handling
 """
 
+import argparse
 import asyncio
 import json
+import statistics
 import subprocess
 import sys
-from pathlib import Path
-from typing import Dict, Any, Optional
 import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from mcp_framing import CHUNK_SIZE, CONTENT_LENGTH, FrameDecoder, encode_frame
 
 class MCPClient:
-    def __init__(self, server_script_path: str):
+    def __init__(self, server_script_path: str, timeout: float = 5.0, verbose: bool = True):
         self.server_script_path = server_script_path
         self.process = None
         self.message_id = 0
         self.reader = None
         self.writer = None
+        self.timeout = timeout
+        self.verbose = verbose
+        # Requests in flight: id -> future resolved by the reader task
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader_task = None
+        # Replies may come NDJSON or Content-Length framed
+        self._decoder = FrameDecoder()
     
     async def start_server(self):
         """Start the MCP server as a subprocess"""
@@ -28,18 +39,21 @@ class MCPClient:
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE
             )
-            print("✓ Server started successfully")
+            self._print("✓ Server started successfully")
             
             # Get stream reader/writer
             self.reader = self.process.stdout
             self.writer = self.process.stdin
             
-            # Give server time to initialize
-            await asyncio.sleep(0.5)
+            # No start-up delay: requests wait in the pipe until the server
+            # reads them, and initialize() completing is the readiness signal
             
             # Start stderr reader task
             asyncio.create_task(self._read_stderr())
             
+            # One task reads every response and hands it to the waiting request
+            self._reader_task = asyncio.create_task(self._read_responses())
+            
         except Exception as e:
             print(f"✗ Error starting server: {e}")
             raise
@@ -57,104 +71,136 @@ class MCPClient:
             except:
                 break
     
-    async def send_message(self, method: str, params: dict = None) -> Optional[Dict[str, Any]]:
-        """Send a JSON-RPC message to the server and wait for response"""
+    @property
+    def outstanding(self) -> int:
+        """Requests sent and still waiting for a response"""
+        return len(self._pending)
+    
+    @property
+    def alive(self) -> bool:
+        """True while the server process runs and its responses are being read"""
+        return (self.process is not None and self.process.returncode is None
+                and self._reader_task is not None and not self._reader_task.done())
+    
+    def _print(self, text: str):
+        """Print progress output unless the client is quiet"""
+        if self.verbose:
+            print(text)
+    
+    async def send_message(self, method: str, params: dict = None,
+                           timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Send a JSON-RPC message to the server and wait for its response.
+        
+        Any number of calls may be in flight at once (e.g. via asyncio.gather);
+        each waits on its own future, up to its own timeout (default self.timeout).
+        """
         self.message_id += 1
+        message_id = self.message_id
         
         message = {
             "jsonrpc": "2.0",
-            "id": self.message_id,
+            "id": message_id,
             "method": method,
         }
         
         if params is not None:
             message["params"] = params
         
-        json_str = json.dumps(message)
-        request = f"Content-Length: {len(json_str)}\r\n\r\n{json_str}"
+        request = encode_frame(message, CONTENT_LENGTH)
         
-        print(f"\n📤 Sending: {method} (id: {self.message_id})")
+        self._print(f"\n📤 Sending: {method} (id: {message_id})")
         if params:
-            print(f"   Params: {json.dumps(params, indent=2)}")
+            self._print(f"   Params: {json.dumps(params, indent=2)}")
+        
+        if self._reader_task is None or self._reader_task.done():
+            print("✗ Server is not running")
+            return None
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
         
         try:
-            self.writer.write(request.encode())
+            self.writer.write(request)
             await self.writer.drain()
         except Exception as e:
-            print(f"✗ Error sending: {e}")
+            self._pending.pop(message_id, None)
+            if future.done():
+                future.exception()  # already failed by the reader at EOF; mark it handled
+            print(f"✗ Error sending: {e!r}")
             return None
         
-        # Wait for response with matching ID
-        response = await self._read_response_for_id(self.message_id)
-        return response
+        try:
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            print(f"✗ Timeout waiting for response to message {message_id}")
+            return None
+        except ConnectionError as e:
+            print(f"✗ {e}")
+            return None
+        finally:
+            self._pending.pop(message_id, None)
     
-    async def _read_response_for_id(self, expected_id: int, timeout: float = 5.0) -> Optional[Dict[str, Any]]:
-        """Read responses until we get one with the expected ID"""
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
+    async def _read_responses(self):
+        """Background task: route every response to the future of its request id"""
+        while True:
             response = await self._read_single_response()
             
             if response is None:
-                await asyncio.sleep(0.1)
+                if self.reader.at_eof():
+                    break
                 continue
             
-            # Check if this is a notification (no ID)
-            if "id" not in response and "method" in response:
-                print(f"📨 Notification: {response.get('method')}")
-                continue
-            
-            # Check if this is our response
-            if response.get("id") == expected_id:
-                return response
-            
-            print(f"⚠️ Unexpected response ID: {response.get('id')} (expected {expected_id})")
+            # A batch reply carries several responses
+            for item in response if isinstance(response, list) else [response]:
+                # Check if this is a notification (no ID)
+                if "id" not in item and "method" in item:
+                    self._print(f"📨 Notification: {item.get('method')}")
+                    continue
+                
+                future = self._pending.get(item.get("id"))
+                if future is None:
+                    print(f"⚠️ Unexpected response ID: {item.get('id')}")
+                elif not future.done():
+                    future.set_result(item)
         
-        print(f"✗ Timeout waiting for response to message {expected_id}")
-        return None
+        # Server went away: fail whatever is still waiting
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Server closed the connection"))
     
     async def _read_single_response(self) -> Optional[Dict[str, Any]]:
-        """Read a single JSON-RPC response"""
+        """
+        Read a single JSON-RPC response (or batch), waiting as long as it takes.
+        
+        Bytes are fed to a FrameDecoder as they arrive, so NDJSON lines and
+        Content-Length frames of any size are handled alike. Returns None at
+        EOF or on a malformed frame.
+        """
         try:
-            # Read Content-Length header
-            header_line = await asyncio.wait_for(self.reader.readline(), timeout=0.5)
-            if not header_line:
-                return None
-            
-            header = header_line.decode().strip()
-            if not header.startswith("Content-Length:"):
-                print(f"⚠️ Unexpected header: {header}")
-                return None
-            
-            content_length = int(header.split(":", 1)[1].strip())
-            
-            # Read empty line
-            await self.reader.readline()
-            
-            # Read JSON content
-            content = await self.reader.read(content_length)
-            if not content:
-                return None
-            
-            response = json.loads(content.decode())
+            response = self._decoder.next_message()
+            while response is None:
+                chunk = await self.reader.read(CHUNK_SIZE)
+                if not chunk:
+                    return None
+                self._decoder.feed(chunk)
+                response = self._decoder.next_message()
             
             # Print response details
-            if "result" in response:
-                print(f"✅ Response received (id: {response.get('id')})")
-            elif "error" in response:
+            if isinstance(response, dict) and "result" in response:
+                self._print(f"✅ Response received (id: {response.get('id')})")
+            elif isinstance(response, dict) and "error" in response:
                 print(f"❌ Error response: {response.get('error')}")
             
             return response
             
-        except asyncio.TimeoutError:
-            return None
         except Exception as e:
             print(f"⚠️ Error reading response: {e}")
             return None
     
-    async def initialize(self):
-        """Initialize the MCP connection"""
-        print("\n=== 🚀 Initializing MCP ===")
+    async def initialize(self, timeout: Optional[float] = None) -> bool:
+        """Initialize the MCP connection; True once the server has answered"""
+        self._print("\n=== 🚀 Initializing MCP ===")
         response = await self.send_message(
             "initialize",
             {
@@ -164,14 +210,15 @@ class MCPClient:
                     "name": "test-client",
                     "version": "1.0.0"
                 }
-            }
+            },
+            timeout=timeout
         )
         
         if response and "result" in response:
             result = response["result"]
-            print(f"✓ Initialized with server: {result.get('serverInfo', {}).get('name', 'unknown')}")
-            print(f"  Version: {result.get('serverInfo', {}).get('version', 'unknown')}")
-            print(f"  Protocol: {result.get('protocolVersion', 'unknown')}")
+            self._print(f"✓ Initialized with server: {result.get('serverInfo', {}).get('name', 'unknown')}")
+            self._print(f"  Version: {result.get('serverInfo', {}).get('version', 'unknown')}")
+            self._print(f"  Protocol: {result.get('protocolVersion', 'unknown')}")
             return True
         return False
     
@@ -188,39 +235,197 @@ class MCPClient:
             return True
         return False
     
-    async def call_tool(self, tool_name: str, arguments: dict):
-        """Call a specific tool"""
-        print(f"\n=== 🎯 Calling Tool: {tool_name} ===")
+    async def call_tool(self, tool_name: str, arguments: dict,
+                        timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Call a specific tool; returns its result, or None on error/timeout"""
+        self._print(f"\n=== 🎯 Calling Tool: {tool_name} ===")
         response = await self.send_message(
             "tools/call",
             {
                 "name": tool_name,
                 "arguments": arguments
-            }
+            },
+            timeout=timeout
         )
         
         if response and "result" in response:
             content = response["result"].get("content", [])
             if content and isinstance(content, list) and len(content) > 0:
                 text = content[0].get('text', 'N/A')
-                print(f"✓ Tool response:")
-                print(f"  {text}")
-            return True
+                self._print(f"✓ Tool response:")
+                self._print(f"  {text}")
+            return response["result"]
         elif response and "error" in response:
             print(f"✗ Tool error: {response['error']}")
-        return False
+        return None
     
     async def close(self):
         """Close connection"""
+        if self._reader_task:
+            self._reader_task.cancel()
+        # Nothing will answer requests still in flight now
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Client closed"))
         if self.process:
-            print("\n[INFO] Terminating server...")
-            self.process.terminate()
+            self._print("\n[INFO] Terminating server...")
+            try:
+                self.process.terminate()
+            except ProcessLookupError:
+                pass  # already exited
             try:
                 await asyncio.wait_for(self.process.wait(), timeout=2)
             except asyncio.TimeoutError:
                 self.process.kill()
                 await self.process.wait()
-            print("✓ Server terminated")
+            self._print("✓ Server terminated")
+
+class MCPClientPool:
+    """
+    N warm server processes behind one send_message/call_tool interface.
+    
+    A worker is ready once its initialize handshake has completed. Each call
+    goes to the live worker with the fewest requests in flight. Ties rotate
+    between workers. A worker whose process exits is replaced in the
+    background. Calls that were in flight on it fail (they return None) and
+    are not retried, because tool calls such as write_file are not idempotent.
+    """
+    
+    def __init__(self, server_script_path: str, size: int = 4, timeout: float = 5.0,
+                 ready_timeout: float = 10.0, verbose: bool = False):
+        self.server_script_path = server_script_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.ready_timeout = ready_timeout
+        self.verbose = verbose
+        self.restarts = 0
+        self._workers: List[Optional[MCPClient]] = [None] * self.size
+        self._slots: List[asyncio.Task] = []
+        self._available = asyncio.Event()
+        self._turn = 0
+        self._closing = False
+    
+    async def __aenter__(self) -> "MCPClientPool":
+        await self.start()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    async def start(self):
+        """Start every worker and wait until all of them are initialized"""
+        loop = asyncio.get_running_loop()
+        ready = [loop.create_future() for _ in range(self.size)]
+        self._slots = [asyncio.create_task(self._run_slot(i, ready[i])) for i in range(self.size)]
+        try:
+            await asyncio.wait_for(asyncio.gather(*ready), self.ready_timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise RuntimeError(f"{self.server_script_path}: workers not ready after {self.ready_timeout:g}s")
+        print(f"✓ {self.size} server worker(s) ready")
+    
+    async def _start_worker(self) -> Optional[MCPClient]:
+        """Spawn one server and complete its handshake; None if it failed"""
+        client = MCPClient(self.server_script_path, timeout=self.timeout, verbose=self.verbose)
+        try:
+            await client.start_server()
+            if await client.initialize(timeout=self.ready_timeout):
+                return client
+        except asyncio.CancelledError:
+            # Pool closing mid-start: don't leave the process behind
+            await client.close()
+            raise
+        except Exception as e:
+            print(f"✗ Error starting worker: {e}")
+        await client.close()
+        return None
+    
+    async def _run_slot(self, index: int, ready: asyncio.Future):
+        """Keep one worker running: start it, wait for it to exit, start a new one"""
+        delay = 0.1
+        while not self._closing:
+            client = await self._start_worker()
+            if client is None:
+                # Back off so a server that cannot start does not spin
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+                continue
+            delay = 0.1
+            
+            if self._closing:
+                await client.close()
+                break
+            self._workers[index] = client
+            self._available.set()
+            if not ready.done():
+                ready.set_result(True)
+            
+            await client.process.wait()
+            self._workers[index] = None
+            if self._closing:
+                break
+            self.restarts += 1
+            print(f"⚠️ Server worker {index} exited (code {client.process.returncode}), restarting")
+            await client.close()
+    
+    async def _pick(self) -> MCPClient:
+        """Live worker with the fewest outstanding requests, waiting for a restart if none is live"""
+        while True:
+            start = self._turn
+            self._turn = (start + 1) % self.size
+            live = [w for w in self._workers[start:] + self._workers[:start] if w is not None and w.alive]
+            if live:
+                return min(live, key=lambda w: w.outstanding)
+            if self._closing:
+                raise ConnectionError("Pool is closed")
+            
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), self.ready_timeout)
+            except asyncio.TimeoutError:
+                raise ConnectionError("No server worker available") from None
+    
+    async def send_message(self, method: str, params: dict = None,
+                           timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Send a JSON-RPC request to the least busy worker and wait for its response"""
+        try:
+            worker = await self._pick()
+        except ConnectionError as e:
+            print(f"✗ {e}")
+            return None
+        return await worker.send_message(method, params, timeout=timeout)
+    
+    async def call_tool(self, tool_name: str, arguments: dict,
+                        timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Call a tool on the least busy worker; returns its result, or None on error/timeout"""
+        try:
+            worker = await self._pick()
+        except ConnectionError as e:
+            print(f"✗ {e}")
+            return None
+        return await worker.call_tool(tool_name, arguments, timeout=timeout)
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-worker pid, liveness and requests in flight"""
+        return [
+            {
+                "pid": w.process.pid if w and w.process else None,
+                "alive": bool(w and w.alive),
+                "outstanding": w.outstanding if w else 0
+            }
+            for w in self._workers
+        ]
+    
+    async def close(self):
+        """Stop restarting workers and terminate them all"""
+        self._closing = True
+        self._available.set()
+        for task in self._slots:
+            task.cancel()
+        await asyncio.gather(*self._slots, return_exceptions=True)
+        workers = [w for w in self._workers if w is not None]
+        self._workers = [None] * self.size
+        await asyncio.gather(*(w.close() for w in workers), return_exceptions=True)
 
 async def test_interactive():
     """Interactive test mode"""
@@ -362,7 +567,55 @@ async def test_automated():
     finally:
         await client.close()
 
+async def benchmark_latency(server_path: str, calls: int = 500):
+    """Measure sequential request round-trip latency against a server"""
+    print(f"\n=== ⏱️ Round-trip latency: {server_path}, {calls} calls each ===")
+    
+    client = MCPClient(server_path, verbose=False)
+    
+    try:
+        await client.start_server()
+        if not await client.initialize():
+            print("✗ Failed to initialize")
+            return
+        
+        requests = [
+            ("tools/list", "tools/list", None),
+            ("list_files", "tools/call", {"name": "list_files", "arguments": {}}),
+            ("read_file (missing)", "tools/call", {"name": "read_file", "arguments": {"filename": "nonexistent.txt"}}),
+        ]
+        print()
+        for label, method, params in requests:
+            # Warm up caches and the server's code paths first
+            for _ in range(10):
+                await client.send_message(method, params)
+            
+            samples = []
+            for _ in range(calls):
+                start = time.perf_counter()
+                await client.send_message(method, params)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            
+            def pct(p: float) -> float:
+                return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+            
+            print(f"  {label:<20} mean {statistics.fmean(samples):6.3f} ms  p50 {pct(50):6.3f} ms  "
+                  f"p95 {pct(95):6.3f} ms  max {samples[-1]:6.3f} ms")
+    finally:
+        await client.close()
+
 async def main():
+    parser = argparse.ArgumentParser(description="MCP client test")
+    parser.add_argument("--benchmark", nargs="?", const="server.py", metavar="SERVER",
+                        help="Measure round-trip latency against a server (default server.py) instead of testing")
+    parser.add_argument("--calls", type=int, default=500, help="Calls per request type for --benchmark")
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        await benchmark_latency(args.benchmark, args.calls)
+        return
+    
     print("Choose mode:")
     print("1. Automated tests")
     print("2. Interactive mode")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+SQLite stand-in for the crypto candle database
+
+Mirrors the symbol, symbol_pair, candle_day and candle_time tables from
+crypto.sql (with the same sample symbols and pairs) so candles can be
+loaded and queried locally without a MySQL server.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbol (
+    smbl_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    smbl_code VARCHAR(4) NOT NULL UNIQUE,
+    smbl_name VARCHAR(100),
+    smbl_is_fiat BOOLEAN NOT NULL DEFAULT 0,
+    smbl_created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    smbl_updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_smbl_is_fiat ON symbol (smbl_is_fiat);
+
+CREATE TABLE IF NOT EXISTS symbol_pair (
+    smpr_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    smpr_base_symbol_id INTEGER NOT NULL REFERENCES symbol(smbl_id),
+    smpr_quote_symbol_id INTEGER NOT NULL REFERENCES symbol(smbl_id),
+    smpr_is_active BOOLEAN NOT NULL DEFAULT 1,
+    smpr_created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    smpr_updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (smpr_base_symbol_id, smpr_quote_symbol_id)
+);
+
+CREATE TABLE IF NOT EXISTS candle_day (
+    cndl_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cndl_symbol_pair_id INTEGER NOT NULL REFERENCES symbol_pair(smpr_id),
+    cndl_date DATE NOT NULL,
+    cndl_created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (cndl_symbol_pair_id, cndl_date)
+);
+CREATE INDEX IF NOT EXISTS idx_cndl_date ON candle_day (cndl_date);
+
+CREATE TABLE IF NOT EXISTS candle_time (
+    cntm_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cntm_candle_day_id INTEGER NOT NULL REFERENCES candle_day(cndl_id),
+    cntm_minutes SMALLINT,
+    cntm_open_price DECIMAL(20, 8) NOT NULL,
+    cntm_high_price DECIMAL(20, 8) NOT NULL,
+    cntm_low_price DECIMAL(20, 8) NOT NULL,
+    cntm_close_price DECIMAL(20, 8) NOT NULL,
+    cntm_volume DECIMAL(20, 8) NOT NULL,
+    UNIQUE (cntm_candle_day_id, cntm_minutes)
+);
+"""
+
+# Sample data inserted by crypto.sql
+SYMBOLS = [
+    ('BTC', 'Bitcoin', False),
+    ('BNB', 'Binance Coin', False),
+    ('SOL', 'Solana', False),
+    ('RED', 'Red Token', False),
+    ('BRL', 'Brazilian Real', True),
+    ('USDC', 'USD Coin', True),
+    ('USDT', 'Tether', True),
+]
+
+PAIRS = [
+    ('BNB', 'BRL'),
+    ('BTC', 'BRL'),
+    ('BTC', 'USDC'),
+    ('BTC', 'USDT'),
+    ('RED', 'USDT'),
+    ('SOL', 'BRL'),
+    ('SOL', 'USDT'),
+]
+
+# One loaded candle: (local date, minutes since midnight, open, high, low, close, volume)
+CandleRow = Tuple[str, int, float, float, float, float, float]
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """
+    Open (creating if needed) the SQLite database with the candle schema.
+
+    Args:
+        db_path: Database file path (':memory:' works for tests)
+
+    Returns:
+        Connection with the schema and sample symbols/pairs in place
+    """
+    # Generous timeout: parallel converter workers take turns writing
+    conn = sqlite3.connect(str(db_path), timeout=60)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO symbol (smbl_code, smbl_name, smbl_is_fiat) VALUES (?, ?, ?)",
+            SYMBOLS
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO symbol_pair (smpr_base_symbol_id, smpr_quote_symbol_id) "
+            "SELECT base.smbl_id, quote.smbl_id FROM symbol base, symbol quote "
+            "WHERE base.smbl_code = ? AND quote.smbl_code = ?",
+            PAIRS
+        )
+    return conn
+
+
+def find_pair_id(conn: sqlite3.Connection, coin_pair: str) -> Optional[int]:
+    """
+    Resolve a pair code like 'BTCUSDT' or 'SOLBRL' to its smpr_id.
+
+    Tries a 4-character quote symbol first, then a 3-character one, in the
+    same order as sp_insert_candle.
+    """
+    for quote_len in (4, 3):
+        if len(coin_pair) < quote_len + 3:
+            continue
+        row = conn.execute(
+            "SELECT sp.smpr_id FROM symbol_pair sp "
+            "INNER JOIN symbol base ON sp.smpr_base_symbol_id = base.smbl_id "
+            "INNER JOIN symbol quote ON sp.smpr_quote_symbol_id = quote.smbl_id "
+            "WHERE base.smbl_code = ? AND quote.smbl_code = ?",
+            (coin_pair[:-quote_len], coin_pair[-quote_len:])
+        ).fetchone()
+        if row:
+            return row[0]
+    return None
+
+
+def load_candles(conn: sqlite3.Connection, coin_pair: str, candles: Iterable[CandleRow],
+                 batch_size: int = 1000) -> int:
+    """
+    Insert candles with executemany, committing every batch_size rows.
+
+    The pair id is resolved once and each trading day id once per load;
+    candles that already exist (same day and minutes) are skipped, like
+    sp_insert_candle does.
+
+    Raises:
+        ValueError: If the pair is not in symbol_pair
+
+    Returns:
+        Number of candles processed
+    """
+    pair_id = find_pair_id(conn, coin_pair)
+    if pair_id is None:
+        raise ValueError(f"Symbol pair not found: {coin_pair}")
+
+    day_ids: Dict[str, int] = {}
+    batch: List[Tuple[int, int, float, float, float, float, float]] = []
+    row_count = 0
+
+    def day_id(day: str) -> int:
+        cached = day_ids.get(day)
+        if cached is None:
+            conn.execute(
+                "INSERT OR IGNORE INTO candle_day (cndl_symbol_pair_id, cndl_date) VALUES (?, ?)",
+                (pair_id, day)
+            )
+            cached = conn.execute(
+                "SELECT cndl_id FROM candle_day WHERE cndl_symbol_pair_id = ? AND cndl_date = ?",
+                (pair_id, day)
+            ).fetchone()[0]
+            day_ids[day] = cached
+        return cached
+
+    def flush_batch():
+        conn.executemany(
+            "INSERT OR IGNORE INTO candle_time (cntm_candle_day_id, cntm_minutes, cntm_open_price, "
+            "cntm_high_price, cntm_low_price, cntm_close_price, cntm_volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            batch
+        )
+        conn.commit()
+        batch.clear()
+
+    try:
+        for day, minutes, open_price, high_price, low_price, close_price, volume in candles:
+            batch.append((day_id(day), minutes, open_price, high_price, low_price, close_price, volume))
+            row_count += 1
+            if len(batch) >= batch_size:
+                flush_batch()
+        if batch:
+            flush_batch()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return row_count
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Columnar binary candle store
+
+One file per pair (df_candles_XXX.CANDLES) holding fixed-width columns:
+int64 UTC epoch seconds plus float64 open/high/low/close/volume. Columns
+are laid out back to back after a small header, each 8-byte aligned, so a
+reader can mmap the file and use the columns directly (as memoryviews or
+NumPy arrays) without parsing any text.
+
+Layout (little-endian):
+    header   : magic b'CNDLCOL1', uint32 version, uint32 column count, uint64 row count
+    directory: per column 16-byte name, 1-byte typecode ('q' or 'd'), 7 pad bytes, uint64 offset
+    data     : column arrays, row count items each
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b'CNDLCOL1'
+VERSION = 1
+SUFFIX = '.CANDLES'
+
+HEADER = struct.Struct('<8sIIQ')
+COLUMN_ENTRY = struct.Struct('<16sc7xQ')
+
+# Column name -> array typecode, in file order
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ('timestamp', 'q'),
+    ('open', 'd'),
+    ('high', 'd'),
+    ('low', 'd'),
+    ('close', 'd'),
+    ('volume', 'd'),
+)
+
+COLUMNS_ORDER = tuple(name for name, _ in COLUMNS)
+PRICE_COLUMNS = COLUMNS_ORDER[1:]
+
+
+def store_path_for(csv_filepath: Path) -> Path:
+    """
+    Columnar store path for a candle CSV (df_candles_XXX.CSV -> df_candles_XXX.CANDLES).
+    """
+    return csv_filepath.with_suffix(SUFFIX)
+
+
+@lru_cache(maxsize=4096)
+def _utc_hour_epoch(utc_hour: str) -> int:
+    """
+    Convert a UTC 'YYYY-MM-DD HH' prefix to epoch seconds at HH:00.
+    """
+    return int(datetime.strptime(utc_hour, '%Y-%m-%d %H').replace(tzinfo=timezone.utc).timestamp())
+
+
+def to_epoch_seconds(timestamp: str) -> int:
+    """
+    Convert a UTC candle timestamp (e.g., '2025-03-14 21:30:00+00:00') to epoch seconds.
+    """
+    return _utc_hour_epoch(timestamp[:13]) + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+
+
+def format_timestamp(epoch: int) -> str:
+    """
+    Format epoch seconds the way the candle CSVs do ('2025-03-14 21:30:00+00:00').
+    """
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(sep=' ')
+
+
+def empty_columns() -> Dict[str, array]:
+    """
+    Fresh, empty arrays for every column.
+    """
+    return {name: array(typecode) for name, typecode in COLUMNS}
+
+
+def write_store(path: Path, columns: Dict[str, Sequence]) -> int:
+    """
+    Write columns to a store file atomically (temp file + rename).
+
+    Args:
+        path: Destination .CANDLES file
+        columns: Column name -> array/sequence; all columns must be the same length
+
+    Returns:
+        Number of rows written
+    """
+    arrays = {name: array(typecode, columns[name]) for name, typecode in COLUMNS}
+    row_count = len(arrays['timestamp'])
+    if any(len(values) != row_count for values in arrays.values()):
+        raise ValueError("All candle columns must have the same length")
+
+    offset = HEADER.size + COLUMN_ENTRY.size * len(COLUMNS)
+    directory = []
+    for name, typecode in COLUMNS:
+        directory.append(COLUMN_ENTRY.pack(name.encode('ascii'), typecode.encode('ascii'), offset))
+        offset += row_count * arrays[name].itemsize
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(COLUMNS), row_count))
+        f.write(b''.join(directory))
+        for name, _ in COLUMNS:
+            values = arrays[name]
+            if sys.byteorder != 'little':
+                values.byteswap()
+            values.tofile(f)
+    os.replace(tmp_path, path)
+    return row_count
+
+
+class CandleStore:
+    """
+    Read-only, memory-mapped view of a .CANDLES file.
+
+    Columns are exposed as memoryviews over the mapping (or NumPy arrays
+    via numpy_column when NumPy is installed), so opening a store costs one
+    mmap and no parsing regardless of its size.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._views: Dict[str, memoryview] = {}
+
+        magic, version, column_count, self.row_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{self.path.name} is not a version {VERSION} candle store")
+        if sys.byteorder != 'little':
+            self.close()
+            raise ValueError("Candle stores can only be mapped on little-endian machines")
+
+        self._layout: Dict[str, Tuple[str, int]] = {}
+        for i in range(column_count):
+            raw_name, typecode, offset = COLUMN_ENTRY.unpack_from(self._mmap, HEADER.size + i * COLUMN_ENTRY.size)
+            name = raw_name.rstrip(b'\0').decode('ascii')
+            self._layout[name] = (typecode.decode('ascii'), offset)
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __enter__(self) -> 'CandleStore':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def column(self, name: str) -> memoryview:
+        """
+        Zero-copy view of one column ('q' int64 timestamps or 'd' float64 values).
+        """
+        view = self._views.get(name)
+        if view is None:
+            typecode, offset = self._layout[name]
+            itemsize = struct.calcsize(typecode)
+            raw = memoryview(self._mmap)[offset:offset + self.row_count * itemsize]
+            view = raw.cast(typecode)
+            self._views[name] = view
+        return view
+
+    def numpy_column(self, name: str):
+        """
+        Zero-copy NumPy array of one column (requires NumPy).
+        """
+        if numpy is None:
+            raise RuntimeError("NumPy is not installed")
+        typecode, offset = self._layout[name]
+        dtype = numpy.int64 if typecode == 'q' else numpy.float64
+        return numpy.frombuffer(self._mmap, dtype=dtype, count=self.row_count, offset=offset)
+
+    def index_range(self, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Row index range [lo, hi) of candles with start <= timestamp <= end.
+
+        Timestamps are UTC epoch seconds; the store is assumed sorted by time
+        (as the candle CSVs are), so this is two binary searches.
+        """
+        timestamps = self.column('timestamp')
+        lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+        hi = self.row_count if end is None else bisect.bisect_right(timestamps, end)
+        return lo, max(lo, hi)
+
+    def close(self):
+        """
+        Release the column views and the mapping.
+        """
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+        if not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+
+def read_columns(path: Path) -> Dict[str, array]:
+    """
+    Copy a store's columns into plain arrays (e.g. to extend and rewrite it).
+    """
+    with CandleStore(path) as store:
+        return {name: array(typecode, store.column(name)) for name, typecode in COLUMNS}
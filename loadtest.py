@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmark for the MCP servers
+
+Spawns server.py or thales.py, drives a weighted mix of tool calls at a
+fixed concurrency (number of calls kept in flight) and reports throughput
+and p50/p95/p99 latency per tool and overall. Results can be saved as JSON
+and compared against an earlier run to catch regressions, e.g.
+
+    python loadtest.py server.py --concurrency 8 --requests 5000 --json base.json
+    python loadtest.py server.py --concurrency 8 --requests 5000 --compare base.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from client import MCPClient, MCPClientPool
+from mcp_framing import JSON_BACKEND
+
+# Fixture files written before the run, read and rewritten by the mix, and
+# deleted from the server's sandbox afterwards
+FIXTURE_PREFIX = "loadtest_"
+SANDBOX_DIR = "mcp_sandbox"
+
+# Default mix per server script (tool -> relative weight). thales_write is left
+# out: it posts to the THALES_INPUT.TXT mailbox Thales really reads, so it only
+# runs when asked for with --mix
+DEFAULT_MIXES = {
+    "server.py": {"read_file": 6, "write_file": 2, "list_files": 2},
+    "thales.py": {"read_file": 3, "write_file": 1, "list_files": 1,
+                  "thales_read": 2, "thales_status": 1},
+}
+
+# Reported percentiles
+PERCENTILES = (50, 95, 99)
+
+
+def _fixture_name(index: int) -> str:
+    return f"{FIXTURE_PREFIX}{index:03d}.txt"
+
+
+def remove_fixtures(server: str, count: int):
+    """Delete the fixture files a run wrote into the server's sandbox"""
+    sandbox = Path(server).resolve().parent / SANDBOX_DIR
+    for i in range(count):
+        try:
+            (sandbox / _fixture_name(i)).unlink()
+        except FileNotFoundError:
+            pass
+
+
+# Tool -> builder of its arguments from (rng, settings)
+OPERATIONS: Dict[str, Callable[[random.Random, argparse.Namespace], Dict[str, Any]]] = {
+    "read_file": lambda rng, cfg: {"filename": _fixture_name(rng.randrange(cfg.files))},
+    "write_file": lambda rng, cfg: {"filename": _fixture_name(rng.randrange(cfg.files)), "content": cfg.payload},
+    "list_files": lambda rng, cfg: {},
+    "thales_write": lambda rng, cfg: {"message": f"loadtest {rng.randrange(1 << 30)}"},
+    "thales_read": lambda rng, cfg: {"since": 0, "max_bytes": 4096},
+    "thales_status": lambda rng, cfg: {},
+    "thales_wait": lambda rng, cfg: {"since": 0, "timeout": 0, "max_bytes": 4096},
+}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """
+    Parse 'tool=weight,...' (a bare tool name has weight 1).
+
+    Raises:
+        ValueError: For unknown tools or non-positive weights
+    """
+    mix = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown tool {name!r} (choose from {', '.join(OPERATIONS)})")
+        mix[name] = float(weight) if weight else 1.0
+        if mix[name] <= 0:
+            raise ValueError(f"Weight for {name} must be positive")
+    if not mix:
+        raise ValueError("Empty mix")
+    return mix
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency statistics in milliseconds"""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    stats = {"mean": statistics.fmean(samples)}
+    stats.update({f"p{p}": percentile(samples, p) for p in PERCENTILES})
+    stats["max"] = samples[-1]
+    return {name: round(value, 4) for name, value in stats.items()}
+
+
+def call_failed(response: Optional[Dict[str, Any]]) -> bool:
+    """True for a timeout, a JSON-RPC error or an 'Error: ...' tool result"""
+    if not response or "result" not in response:
+        return True
+    result = response["result"]
+    if result.get("isError"):
+        return True
+    content = result.get("content") or [{}]
+    return str(content[0].get("text", "")).startswith("Error")
+
+
+async def run_load(args: argparse.Namespace, mix: Dict[str, float]) -> Dict[str, Any]:
+    """Spawn the server, write fixtures, warm up, then run the measured load"""
+    if args.pool:
+        client = MCPClientPool(args.server, size=args.pool, timeout=args.timeout)
+    else:
+        client = MCPClient(args.server, timeout=args.timeout, verbose=False)
+    rng = random.Random(args.seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    async def call(name: str) -> Tuple[float, bool]:
+        params = {"name": name, "arguments": OPERATIONS[name](rng, args)}
+        start = time.perf_counter()
+        response = await client.send_message("tools/call", params)
+        return (time.perf_counter() - start) * 1000, call_failed(response)
+
+    try:
+        if args.pool:
+            await client.start()
+        else:
+            await client.start_server()
+            if not await client.initialize():
+                raise RuntimeError(f"Failed to initialize {args.server}")
+
+        for i in range(args.files):
+            response = await client.send_message("tools/call", {
+                "name": "write_file", "arguments": {"filename": _fixture_name(i), "content": args.payload}})
+            if call_failed(response):
+                raise RuntimeError(f"Could not write fixture {_fixture_name(i)}")
+
+        samples: Dict[str, List[float]] = {name: [] for name in names}
+        errors: Dict[str, int] = {name: 0 for name in names}
+
+        async def worker(budget: List[int], deadline: Optional[float], record: bool):
+            while True:
+                if deadline is not None:
+                    if time.perf_counter() >= deadline:
+                        return
+                elif budget[0] <= 0:
+                    return
+                budget[0] -= 1
+                name = rng.choices(names, weights)[0]
+                elapsed, failed = await call(name)
+                if record:
+                    samples[name].append(elapsed)
+                    if failed:
+                        errors[name] += 1
+
+        if args.warmup:
+            print(f"Warming up ({args.warmup} calls)...")
+            budget = [args.warmup]
+            await asyncio.gather(*(worker(budget, None, False) for _ in range(args.concurrency)))
+
+        if args.duration:
+            print(f"Running for {args.duration:g}s at concurrency {args.concurrency}...")
+        else:
+            print(f"Running {args.requests} calls at concurrency {args.concurrency}...")
+        budget = [args.requests]
+        start = time.perf_counter()
+        deadline = start + args.duration if args.duration else None
+        await asyncio.gather(*(worker(budget, deadline, True) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.close()
+        remove_fixtures(args.server, args.files)
+
+    every = [value for values in samples.values() for value in values]
+    return {
+        "server": Path(args.server).name,
+        "mix": mix,
+        "concurrency": args.concurrency,
+        "server_concurrency": os.environ.get("MCP_CONCURRENCY"),
+        "pool": args.pool,
+        "payload_bytes": len(args.payload.encode("utf-8")),
+        "requests": len(every),
+        "errors": sum(errors.values()),
+        "duration_s": round(elapsed, 4),
+        "throughput_rps": round(len(every) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize(every),
+        "operations": {
+            name: {"requests": len(samples[name]), "errors": errors[name],
+                   "latency_ms": summarize(samples[name])}
+            for name in names
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": sys.platform,
+            "cpus": os.cpu_count(),
+            "json_backend": JSON_BACKEND,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """Human-readable summary of one run"""
+    columns = ("mean",) + tuple(f"p{p}" for p in PERCENTILES) + ("max",)
+    print(f"\n=== 📊 {report['server']}: {report['requests']} calls in {report['duration_s']:.2f}s "
+          f"-> {report['throughput_rps']:.1f} calls/s, {report['errors']} errors ===\n")
+    print(f"  {'tool':<15} {'calls':>7} {'errors':>6}  " + "  ".join(f"{c:>8}" for c in columns) + "   (ms)")
+    rows = list(report["operations"].items()) + [("all", {"requests": report["requests"],
+                                                          "errors": report["errors"],
+                                                          "latency_ms": report["latency_ms"]})]
+    for name, op in rows:
+        latency = op["latency_ms"]
+        cells = "  ".join(f"{latency.get(c, float('nan')):8.3f}" for c in columns)
+        print(f"  {name:<15} {op['requests']:>7} {op['errors']:>6}  {cells}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Compare a run with a baseline run.
+
+    Returns:
+        Regressions beyond tolerance (a fraction, e.g. 0.1): lower throughput,
+        or higher p95/p99 latency overall or for a tool present in both
+    """
+    regressions = []
+    print(f"\n=== 🔍 Compared with baseline from {baseline.get('environment', {}).get('timestamp', '?')} ===\n")
+    for key in ("server", "mix", "concurrency", "server_concurrency", "pool", "payload_bytes"):
+        if baseline.get(key) != report[key]:
+            print(f"  ⚠️ Baseline {key} differs: {baseline.get(key)!r} vs {report[key]!r}")
+
+    def check(label: str, now: float, before: float, higher_is_better: bool):
+        if not before:
+            return
+        change = (now - before) / before
+        worse = -change if higher_is_better else change
+        flag = "✗" if worse > tolerance else "✓"
+        print(f"  {flag} {label:<28} {before:10.3f} -> {now:10.3f}  ({change:+.1%})")
+        if worse > tolerance:
+            regressions.append(f"{label}: {before:.3f} -> {now:.3f} ({change:+.1%})")
+
+    check("throughput (calls/s)", report["throughput_rps"], baseline.get("throughput_rps", 0), True)
+    rows = [("all", report["latency_ms"], baseline.get("latency_ms", {}))]
+    for name, op in report["operations"].items():
+        before = baseline.get("operations", {}).get(name)
+        if before:
+            rows.append((name, op["latency_ms"], before.get("latency_ms", {})))
+    for name, now, before in rows:
+        for stat in ("p95", "p99"):
+            if stat in now:
+                check(f"{name} {stat} (ms)", now[stat], before.get(stat, 0), False)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the MCP servers")
+    parser.add_argument("server", nargs="?", default="server.py", help="Server script to spawn (default server.py)")
+    parser.add_argument("--mix", help="Weighted tools, e.g. read_file=6,write_file=2,list_files=2 "
+                                      f"(tools: {', '.join(OPERATIONS)}; default depends on the server; "
+                                      "thales_write posts to the live Thales mailbox)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Calls kept in flight (default 1)")
+    parser.add_argument("--server-concurrency", type=int,
+                        help="Set MCP_CONCURRENCY for the spawned server (server.py runs that many calls at once)")
+    parser.add_argument("--pool", type=int, default=0,
+                        help="Spread calls over this many warm server processes (MCPClientPool)")
+    parser.add_argument("--requests", type=int, default=2000, help="Measured calls (default 2000)")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of a call count")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured calls first (default 100)")
+    parser.add_argument("--files", type=int, default=20, help="Fixture files to read/write (default 20)")
+    parser.add_argument("--payload-bytes", type=int, default=4096, help="write_file/fixture size (default 4096)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-call timeout in seconds (default 30)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the mix (default 0)")
+    parser.add_argument("--json", metavar="PATH", help="Save the results as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with a saved JSON run; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed relative slowdown for --compare (default 0.10)")
+    args = parser.parse_args()
+
+    if args.concurrency < 1 or args.files < 1 or args.requests < 1:
+        parser.error("--concurrency, --files and --requests must be at least 1")
+    try:
+        mix = parse_mix(args.mix) if args.mix else dict(DEFAULT_MIXES.get(Path(args.server).name, DEFAULT_MIXES["server.py"]))
+    except ValueError as e:
+        parser.error(str(e))
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            parser.error(f"Cannot read baseline: {e}")
+
+    if args.server_concurrency:
+        os.environ["MCP_CONCURRENCY"] = str(args.server_concurrency)
+    args.payload = ("loadtest payload line\n" * (args.payload_bytes // 22 + 1))[:args.payload_bytes]
+
+    report = asyncio.run(run_load(args, mix))
+    print_report(report)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"\n✓ Results saved to {args.json}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+        print(f"\n✓ No regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
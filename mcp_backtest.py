@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Backtesting for the crypto_strategy.php trading strategy
+
+Replays the site's Bollinger/RSI strategy over candle price series:
+buy trade_amount when the price is within buy_band of the lower band and
+RSI < buy_rsi, sell everything when the price is within sell_band of the
+upper band and RSI > sell_rsi. Parameter sweeps compute each distinct set
+of indicators once and spread the groups over a process pool.
+
+Run directly to time a sweep:
+    python mcp_backtest.py --benchmark [PAIR]
+"""
+
+import argparse
+import bisect
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mcp_indicators import bollinger_bands, macd, rsi
+
+# Strategy parameters and their crypto_strategy.php values
+DEFAULT_PARAMS: Dict[str, Any] = {
+    "bb_period": 20,
+    "bb_std_dev": 2.0,
+    "rsi_period": 14,
+    "macd_fast": 12,
+    "macd_slow": 26,
+    "macd_signal": 9,
+    "buy_rsi": 35.0,
+    "sell_rsi": 65.0,
+    "buy_band": 1.005,
+    "sell_band": 0.995,
+    "initial_fiat": 10000.0,
+    "trade_amount": 1000.0,
+    "min_trade": 10.0,
+    "warmup": 20,
+}
+
+# Parameters that change the indicator series (the rest only change the rules)
+INDICATOR_PARAMS = ("bb_period", "bb_std_dev", "rsi_period", "macd_fast", "macd_slow", "macd_signal")
+
+# Everything PreparedSeries depends on
+_PREPARE_PARAMS = INDICATOR_PARAMS + ("warmup",)
+
+_INT_PARAMS = {"bb_period", "rsi_period", "macd_fast", "macd_slow", "macd_signal", "warmup"}
+
+# Sweeps smaller than this run in-process; process start-up would dominate
+MIN_PARALLEL_COMBOS = 200
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def resolve_params(params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    DEFAULT_PARAMS overridden by params, with types normalized.
+
+    Raises:
+        ValueError: On an unknown parameter name
+    """
+    unknown = [k for k in (params or {}) if k not in DEFAULT_PARAMS]
+    if unknown:
+        raise ValueError(f"Unknown backtest parameter(s): {', '.join(unknown)}")
+    resolved = dict(DEFAULT_PARAMS)
+    resolved.update({k: v for k, v in (params or {}).items() if v is not None})
+    return {k: int(v) if k in _INT_PARAMS else float(v) for k, v in resolved.items()}
+
+
+def expand_grid(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of a parameter grid ({name: [values]}) as a list of override dicts"""
+    names = list(grid)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+class PreparedSeries:
+    """
+    Prices and the strategy's indicator columns for one set of indicator parameters.
+
+    Columns are trimmed to start at the first candle where the strategy
+    may trade (after warm-up, with every indicator available), which is
+    also where buy-and-hold enters.
+    """
+
+    def __init__(self, prices: Sequence[float], params: Dict[str, Any]):
+        bands = bollinger_bands(prices, params["bb_period"], params["bb_std_dev"])
+        rsi_values = rsi(prices, params["rsi_period"])
+        histogram = macd(prices, params["macd_fast"], params["macd_slow"], params["macd_signal"])["histogram"]
+
+        # Once available, each indicator stays available to the end
+        start = len(prices)
+        for i in range(min(params["warmup"], len(prices)), len(prices)):
+            if bands["lower"][i] is not None and rsi_values[i] is not None and histogram[i] is not None:
+                start = i
+                break
+        self.start = start
+        self.prices = list(prices[start:])
+        self.lower = bands["lower"][start:]
+        self.upper = bands["upper"][start:]
+        self.rsi = rsi_values[start:]
+        self.last_price = prices[-1] if prices else None
+        self.hold_price = prices[min(params["warmup"], len(prices) - 1)] if prices else None
+
+
+def simulate(series: PreparedSeries, params: Dict[str, Any], timestamps: Optional[Sequence[int]] = None,
+             with_trades: bool = True) -> Dict[str, Any]:
+    """
+    Run the strategy rules over prepared indicator columns.
+
+    Buy and sell candidates are found with one comprehension each over the
+    whole series; the position then jumps from candidate to candidate with
+    bisect instead of stepping through every candle. Mark-to-market equity
+    is only walked while a position is open, for the max drawdown.
+
+    Returns:
+        Summary with final_value, pnl, return_pct, buy_hold_pct,
+        max_drawdown_pct, trade_count and (optionally) trades
+    """
+    prices, lower, upper, rsi_values = series.prices, series.lower, series.upper, series.rsi
+    buy_band, buy_rsi = params["buy_band"], params["buy_rsi"]
+    sell_band, sell_rsi = params["sell_band"], params["sell_rsi"]
+
+    buys = [i for i, (p, lo, r) in enumerate(zip(prices, lower, rsi_values)) if p <= lo * buy_band and r < buy_rsi]
+    sells = [i for i, (p, up, r) in enumerate(zip(prices, upper, rsi_values)) if p >= up * sell_band and r > sell_rsi]
+
+    initial = params["initial_fiat"]
+    fiat = initial
+    crypto = 0.0
+    peak = initial
+    max_drawdown = 0.0
+    trades: List[Dict[str, Any]] = []
+    trade_count = 0
+    i = 0
+    n = len(prices)
+
+    while True:
+        k = bisect.bisect_left(buys, i)
+        if k == len(buys):
+            break
+        b = buys[k]
+        amount = min(params["trade_amount"], fiat)
+        if amount < params["min_trade"]:
+            break  # fiat only changes when selling, so no later buy can succeed
+        crypto = amount / prices[b]
+        fiat -= amount
+        trade_count += 1
+        if with_trades:
+            trades.append(_trade("BUY", series.start + b, prices[b], crypto, amount, rsi_values[b], timestamps))
+
+        k = bisect.bisect_right(sells, b)
+        s = sells[k] if k < len(sells) else None
+
+        for t in range(b, n if s is None else s + 1):
+            equity = fiat + crypto * prices[t]
+            if equity > peak:
+                peak = equity
+            elif peak > 0:
+                max_drawdown = max(max_drawdown, (peak - equity) / peak)
+        if s is None:
+            break
+
+        received = crypto * prices[s]
+        fiat += received
+        trade_count += 1
+        if with_trades:
+            trades.append(_trade("SELL", series.start + s, prices[s], crypto, received, rsi_values[s], timestamps))
+        crypto = 0.0
+        i = s + 1
+
+    final_value = fiat + crypto * series.last_price if series.last_price is not None else fiat
+    buy_hold_pct = None
+    if series.hold_price:
+        buy_hold_pct = (initial / series.hold_price * series.last_price - initial) / initial * 100
+    result = {
+        "final_value": final_value,
+        "pnl": final_value - initial,
+        "return_pct": (final_value - initial) / initial * 100 if initial else 0.0,
+        "buy_hold_pct": buy_hold_pct,
+        "max_drawdown_pct": max_drawdown * 100,
+        "trade_count": trade_count,
+        "open_position": crypto > 0,
+    }
+    if with_trades:
+        result["trades"] = trades
+    return result
+
+
+def _trade(kind: str, index: int, price: float, amount: float, total: float, rsi_value: float,
+           timestamps: Optional[Sequence[int]]) -> Dict[str, Any]:
+    """One trade record, as crypto_strategy.php's $trades entries"""
+    trade = {"type": kind, "index": index, "price": price, "amount": amount, "total": total, "rsi": rsi_value}
+    if timestamps is not None:
+        trade["timestamp"] = timestamps[index]
+    return trade
+
+
+def backtest(prices: Sequence[float], params: Optional[Dict[str, Any]] = None,
+             timestamps: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+    """Run one backtest with trade list"""
+    resolved = resolve_params(params)
+    result = simulate(PreparedSeries(prices, resolved), resolved, timestamps)
+    result["params"] = resolved
+    return result
+
+
+def _sweep_group(task: Tuple[str, Sequence[float], Dict[str, Any], List[Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+    """
+    Worker: prepare indicators once for a group sharing indicator parameters, then run every rule combo.
+    """
+    pair, prices, indicator_params, combos = task
+    series = PreparedSeries(prices, resolve_params(indicator_params))
+    results = []
+    for combo in combos:
+        params = resolve_params(combo)
+        results.append((pair, combo, simulate(series, params, with_trades=False)))
+    return results
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Shared process pool, created on first parallel sweep.
+
+    The server is multi-threaded by then, so workers are never forked from
+    it: they come from a forkserver (preloaded with this module) or, where
+    that is unavailable, are spawned.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _pool
+
+
+def shutdown():
+    """Stop the shared process pool, if one was started"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def sweep(price_series: Dict[str, Sequence[float]], base_params: Optional[Dict[str, Any]],
+          grid: Dict[str, Sequence[Any]], workers: Optional[int] = None,
+          top: int = 10) -> Dict[str, Any]:
+    """
+    Backtest every combination of a parameter grid on every pair.
+
+    Combos are grouped by their indicator parameters so each group's
+    indicators are computed once; groups run on a process pool of
+    `workers` processes (default: CPU count) unless the sweep is small.
+
+    Returns:
+        {"combos": total runs, "seconds": elapsed, "best": top results by return}
+    """
+    start = time.perf_counter()
+    base = dict(base_params or {})
+    combos = [{**base, **override} for override in expand_grid(grid)] or [base]
+
+    # Also rejects unknown parameter names before anything is fanned out
+    groups: Dict[Tuple, List[Dict[str, Any]]] = {}
+    for combo in combos:
+        resolved = resolve_params(combo)
+        groups.setdefault(tuple(resolved[k] for k in _PREPARE_PARAMS), []).append(combo)
+
+    tasks = []
+    for pair, prices in price_series.items():
+        for key, group in groups.items():
+            indicator_params = dict(zip(_PREPARE_PARAMS, key))
+            # Split big groups so every worker gets a share
+            for i in range(0, len(group), 500):
+                tasks.append((pair, list(prices), indicator_params, group[i:i + 500]))
+
+    total = len(combos) * len(price_series)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and total >= MIN_PARALLEL_COMBOS and len(tasks) > 1:
+        batches = list(_get_pool(workers).map(_sweep_group, tasks))
+    else:
+        batches = [_sweep_group(task) for task in tasks]
+
+    ranked = sorted(
+        (r for batch in batches for r in batch),
+        key=lambda r: r[2]["return_pct"],
+        reverse=True
+    )
+    return {
+        "combos": total,
+        "seconds": time.perf_counter() - start,
+        "best": [{"pair": pair, "params": combo, **result} for pair, combo, result in ranked[:max(1, top)]],
+    }
+
+
+def run_benchmark(pair: str, workers: Optional[int] = None) -> None:
+    """Time a 6,075-combination sweep on one bundled pair (1h candles, mid price)"""
+    from mcp_candles import CandleCache, resample
+    from mcp_indicators import price_series as pick_prices
+
+    cache = CandleCache(Path(__file__).parent / "database", max_pairs=1)
+    prices = pick_prices(resample(cache.get(pair), 3600))
+    grid = {
+        "bb_period": [14, 20, 26],
+        "bb_std_dev": [1.5, 2.0, 2.5],
+        "rsi_period": [10, 14, 18],
+        "buy_rsi": [25, 30, 35, 40, 45],
+        "sell_rsi": [55, 60, 65, 70, 75],
+        "buy_band": [1.0, 1.005, 1.01],
+        "sell_band": [0.99, 0.995, 1.0],
+    }
+    result = sweep({pair.upper(): prices}, None, grid, workers=workers, top=3)
+    print(f"{pair.upper()}: {len(prices)} 1h candles, {result['combos']} combos "
+          f"in {result['seconds']:.2f}s ({result['combos'] / result['seconds']:,.0f} combos/s)")
+    for r in result["best"]:
+        print(f"  {r['return_pct']:+7.2f}%  dd {r['max_drawdown_pct']:5.2f}%  "
+              f"{r['trade_count']:3d} trades  {r['params']}")
+
+
+def main():
+    """Command line entry point (benchmark only)"""
+    parser = argparse.ArgumentParser(description="Backtest the crypto_strategy.php strategy")
+    parser.add_argument('--benchmark', nargs='?', const='SOLBRL', metavar='PAIR',
+                        help="Time a parameter sweep on one bundled pair (default SOLBRL)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+    if args.benchmark is None:
+        parser.print_help()
+        return
+    run_benchmark(args.benchmark, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Candle data helpers for the MCP server's market data tools
+"""
+
+import bisect
+import csv
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, time as dt_time, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from database import candle_store
+
+# Value columns a query may ask for, in CSV order
+CANDLE_FIELDS = candle_store.PRICE_COLUMNS
+
+# CSV header name for each value column
+_CSV_FIELDS = {name: f"{name}_price" if name != "volume" else name for name in CANDLE_FIELDS}
+
+# Resampling intervals offered by aggregate_candles, in seconds
+INTERVALS = {"1h": 3600, "4h": 4 * 3600, "1d": 86400}
+
+# Serve .CANDLES stores straight from their mmap. Not on Windows, where a
+# mapped file cannot be replaced by the converter while the server runs.
+MAP_STORES = os.name != 'nt'
+
+_PAIR_PATTERN = re.compile(r'^[A-Z0-9]{2,20}$')
+_CSV_PATTERN = re.compile(r'^df_candles_([A-Za-z0-9]+)\.csv$', re.IGNORECASE)
+
+
+def parse_time(value: Any, end: bool = False) -> Optional[int]:
+    """
+    Parse a query bound to UTC epoch seconds.
+
+    Accepts epoch seconds or ISO 8601 text ('2025-03-14', '2025-03-14 21:30',
+    '2025-03-14T21:30:00-03:00'); text without an offset is taken as UTC.
+    A bare date used as an end bound covers that whole day.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+
+    text = str(value).strip()
+    if text.lstrip('-').isdigit():
+        return int(text)
+    parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if end and len(text) == 10:
+        parsed = datetime.combine(parsed.date(), dt_time(23, 59, 59))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def index_range(timestamps: array, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[int, int]:
+    """Row range [lo, hi) of sorted timestamps with start <= timestamp <= end, by binary search"""
+    lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+    hi = len(timestamps) if end is None else bisect.bisect_right(timestamps, end)
+    return lo, max(lo, hi)
+
+
+def load_csv_columns(csv_filepath: Path) -> Dict[str, array]:
+    """
+    Parse a df_candles_*.CSV file into timestamp/OHLCV arrays.
+
+    Raises:
+        ValueError: If a required column is missing
+    """
+    columns = candle_store.empty_columns()
+    with open(csv_filepath, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        wanted = ['timestamp'] + [_CSV_FIELDS[name] for name in CANDLE_FIELDS]
+        missing = [name for name in wanted if name not in header]
+        if missing:
+            raise ValueError(f"{csv_filepath.name} is missing column(s): {', '.join(missing)}")
+        positions = [header.index(name) for name in wanted]
+
+        timestamps = columns['timestamp']
+        values = [columns[name] for name in CANDLE_FIELDS]
+        to_epoch = candle_store.to_epoch_seconds
+        for row in reader:
+            if not row:
+                continue
+            timestamps.append(to_epoch(row[positions[0]]))
+            for column, pos in zip(values, positions[1:]):
+                column.append(float(row[pos]))
+    return columns
+
+
+class CandleSeries:
+    """
+    One pair's candles as parallel columns with a sorted timestamp index.
+
+    Columns are arrays, or memoryviews over a memory-mapped .CANDLES store,
+    which is then held in `store` so the mapping lives as long as the series.
+    Instances are treated as immutable once loaded; derived data (e.g.
+    resampled rollups) can be cached in `derived` and is dropped together
+    with the series when the source file changes.
+    """
+
+    def __init__(self, pair: str, source: Path, columns: Dict[str, Sequence],
+                 store: Optional[candle_store.CandleStore] = None):
+        self.pair = pair
+        self.source = source
+        self.store = store
+        timestamps = columns['timestamp']
+
+        if any(timestamps[i] > timestamps[i + 1] for i in range(len(timestamps) - 1)):
+            order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+            columns = {name: array(getattr(values, 'typecode', None) or values.format, (values[i] for i in order))
+                       for name, values in columns.items()}
+
+        self.columns = columns
+        self.timestamps = columns['timestamp']
+        self.derived: Dict[Any, Any] = {}
+        self.derived_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+def _resample_numpy(columns: Dict[str, array], seconds: int, offset: int) -> Dict[str, array]:
+    """Vectorized resample: group boundaries from a diff, then ufunc.reduceat per column"""
+    np = candle_store.numpy
+    ts = np.frombuffer(columns['timestamp'], dtype=np.int64)
+    buckets = (ts + offset) // seconds * seconds - offset
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], len(ts)) - 1
+    col = {name: np.frombuffer(columns[name], dtype=np.float64) for name in CANDLE_FIELDS}
+    result = {
+        'timestamp': buckets[starts],
+        'open': col['open'][starts],
+        'high': np.maximum.reduceat(col['high'], starts),
+        'low': np.minimum.reduceat(col['low'], starts),
+        'close': col['close'][ends],
+        'volume': np.add.reduceat(col['volume'], starts),
+    }
+    out = candle_store.empty_columns()
+    for name, values in result.items():
+        out[name].frombytes(values.tobytes())
+    return out
+
+
+def _resample_loop(columns: Dict[str, array], seconds: int, offset: int) -> Dict[str, array]:
+    """Single-pass resample for when NumPy is not installed"""
+    out = candle_store.empty_columns()
+    out_ts, out_open, out_high, out_low, out_close, out_volume = (out[name] for name in candle_store.COLUMNS_ORDER)
+    current = None
+    for ts, o, h, l, c, v in zip(*(columns[name] for name in candle_store.COLUMNS_ORDER)):
+        bucket = (ts + offset) // seconds * seconds - offset
+        if bucket != current:
+            current = bucket
+            out_ts.append(bucket)
+            out_open.append(o)
+            out_high.append(h)
+            out_low.append(l)
+            out_close.append(c)
+            out_volume.append(v)
+        else:
+            if h > out_high[-1]:
+                out_high[-1] = h
+            if l < out_low[-1]:
+                out_low[-1] = l
+            out_close[-1] = c
+            out_volume[-1] += v
+    return out
+
+
+def resample(series: "CandleSeries", seconds: int, offset: int = 0) -> Dict[str, array]:
+    """
+    Resample a series into buckets of `seconds` (OHLC first/max/min/last, volume sum).
+
+    Buckets start on multiples of `seconds` in local time, where local time
+    is UTC plus `offset` seconds (e.g. -3 * 3600 for São Paulo days). Each
+    bucket is labelled with its start as UTC epoch seconds. Results are
+    cached on the series, so they are rebuilt only after the source file
+    changes and the series is reloaded.
+    """
+    key = ('resample', seconds, offset)
+    with series.derived_lock:
+        cached = series.derived.get(key)
+        if cached is None:
+            if candle_store.numpy is not None and len(series):
+                cached = _resample_numpy(series.columns, seconds, offset)
+            else:
+                cached = _resample_loop(series.columns, seconds, offset)
+            series.derived[key] = cached
+    return cached
+
+
+class CandleCache:
+    """
+    Lazily loaded, LRU-bounded cache of CandleSeries keyed by pair.
+
+    Each pair is read on first use from database/df_candles_PAIR.CSV, or from
+    its columnar .CANDLES copy when that is at least as new as the CSV; the
+    copy is memory-mapped (see MAP_STORES), so loading it costs no parsing
+    or copying and the mapping is released once the evicted series is no
+    longer in use.
+    Every lookup re-stats the CSV so a rewritten file is reloaded, and the
+    least recently used pairs are evicted beyond max_pairs.
+    """
+
+    def __init__(self, directory: Path, max_pairs: int = 4):
+        self.directory = directory
+        self.max_pairs = max(1, max_pairs)
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], CandleSeries]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pairs(self) -> List[str]:
+        """Pairs that have a candle CSV in the directory"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted({m.group(1).upper() for m in map(_CSV_PATTERN.match, names) if m})
+
+    def _csv_path(self, pair: str) -> Optional[Path]:
+        for suffix in ('.CSV', '.csv'):
+            path = self.directory / f"df_candles_{pair}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    def _load(self, pair: str, csv_path: Path, csv_stat: os.stat_result) -> CandleSeries:
+        store_path = candle_store.store_path_for(csv_path)
+        try:
+            if store_path.stat().st_mtime_ns >= csv_stat.st_mtime_ns:
+                if not MAP_STORES:
+                    return CandleSeries(pair, store_path, candle_store.read_columns(store_path))
+                store = candle_store.CandleStore(store_path)
+                columns = {name: store.column(name) for name in candle_store.COLUMNS_ORDER}
+                return CandleSeries(pair, store_path, columns, store)
+        except (OSError, ValueError):
+            pass  # no usable store, parse the CSV
+        return CandleSeries(pair, csv_path, load_csv_columns(csv_path))
+
+    def get(self, pair: str) -> CandleSeries:
+        """
+        Return the candles for a pair, loading or reloading as needed.
+
+        Raises:
+            ValueError: If the pair name is invalid
+            FileNotFoundError: If there is no CSV for the pair
+        """
+        pair = str(pair).upper()
+        if not _PAIR_PATTERN.match(pair):
+            raise ValueError(f"Invalid pair: {pair!r}")
+        csv_path = self._csv_path(pair)
+        if csv_path is None:
+            available = ", ".join(self.pairs()) or "none"
+            raise FileNotFoundError(f"No candle data for {pair} (available: {available})")
+
+        csv_stat = csv_path.stat()
+        signature = (csv_stat.st_mtime_ns, csv_stat.st_size)
+        with self._lock:
+            entry = self._entries.get(pair)
+            if entry and entry[0] == signature:
+                self._entries.move_to_end(pair)
+                return entry[1]
+
+        # Parse outside the lock so other pairs stay available meanwhile
+        series = self._load(pair, csv_path, csv_stat)
+        with self._lock:
+            self._entries[pair] = (signature, series)
+            self._entries.move_to_end(pair)
+            while len(self._entries) > self.max_pairs:
+                self._entries.popitem(last=False)
+        return series
@@ -0,0 +1,684 @@
+#!/usr/bin/env python3
+"""
+Shared file helpers for the MCP servers' sandbox tools
+"""
+
+import bisect
+import ctypes
+import ctypes.util
+import fnmatch
+import itertools
+import os
+import re
+import select
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Slice size used when a ranged read gives an offset but no length
+DEFAULT_READ_LENGTH = 1024 * 1024
+
+
+def _utf8_tail_cut(data: bytes) -> int:
+    """Return how many trailing bytes form an incomplete UTF-8 sequence"""
+    # Walk back over at most 3 continuation bytes to the lead byte
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue  # continuation byte, keep looking for the lead
+        if byte & 0x80 == 0:
+            return 0  # ASCII, sequence complete
+        needed = 2 if byte & 0xE0 == 0xC0 else 3 if byte & 0xF0 == 0xE0 else 4
+        return back if back < needed else 0
+    return 0
+
+
+def read_range(filepath: Path, offset: int = 0, length: int = DEFAULT_READ_LENGTH) -> Tuple[str, Dict[str, Any]]:
+    """
+    Read a byte slice of a file with a single seek + read.
+
+    The slice is shortened so it never ends inside a UTF-8 character; the
+    returned cursor's next_offset is where the following read should start.
+
+    Returns:
+        (text, cursor) where cursor holds offset, next_offset, size and eof
+    """
+    if offset < 0 or length <= 0:
+        raise ValueError("offset must be >= 0 and length must be > 0")
+
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(offset)
+        data = f.read(length)
+
+    end = offset + len(data)
+    if end < size:
+        cut = _utf8_tail_cut(data)
+        if cut and cut < len(data):
+            data = data[:-cut]
+            end -= cut
+
+    cursor = {
+        "offset": offset,
+        "next_offset": end,
+        "size": size,
+        "eof": end >= size,
+    }
+    return data.decode('utf-8', errors='replace'), cursor
+
+
+def read_lines_since(
+    filepath: Path,
+    offset: int = 0,
+    max_bytes: int = DEFAULT_READ_LENGTH,
+    settle: Optional[float] = None,
+) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Read whole lines appended to a file since a byte offset.
+
+    The slice ends at the last newline read, so a line the writer is still
+    producing is held back and returned whole on a later call; only a line
+    longer than max_bytes is handed over in pieces. A writer may also never
+    end its last line: with settle set, that unterminated tail is returned
+    once the file has not been modified for settle seconds (0 = at once).
+    If the file is now shorter than offset it was rewritten, and reading
+    restarts at 0 with cursor["reset"] set.
+
+    Returns:
+        (raw bytes, cursor) where cursor holds offset, next_offset, size, eof, reset
+    """
+    if offset < 0 or max_bytes <= 0:
+        raise ValueError("offset must be >= 0 and max_bytes must be > 0")
+
+    with open(filepath, 'rb') as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        reset = offset > size
+        if reset:
+            offset = 0
+        f.seek(offset)
+        data = f.read(max_bytes)
+
+    newline = data.rfind(b'\n')
+    if settle is not None and offset + len(data) >= size and time.time() - st.st_mtime >= settle:
+        pass  # the writer has gone quiet: its unterminated tail is final
+    elif newline >= 0:
+        data = data[:newline + 1]
+    elif len(data) == max_bytes:
+        # One very long line: hand it over in pieces on character boundaries
+        cut = _utf8_tail_cut(data)
+        if cut and cut < len(data):
+            data = data[:-cut]
+    else:
+        # Unterminated tail: wait until its newline has been written
+        data = b''
+    end = offset + len(data)
+
+    cursor = {
+        "offset": offset,
+        "next_offset": end,
+        "size": size,
+        "eof": end >= size,
+        "reset": reset,
+    }
+    return data, cursor
+
+
+def line_start_before(filepath: Path, offset: int, chunk: int = 64 * 1024) -> int:
+    """Offset just past the last newline before offset (0 if there is none)"""
+    with open(filepath, 'rb') as f:
+        end = min(offset, os.fstat(f.fileno()).st_size)
+        while end > 0:
+            start = max(0, end - chunk)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def write_text_file(filepath: Path, content: str, append: bool = False, fsync: bool = False) -> int:
+    """
+    Write (or append) text to a file, optionally fsync'ing before returning.
+
+    Returns:
+        Number of characters written
+    """
+    with open(filepath, 'a' if append else 'w', encoding='utf-8') as f:
+        f.write(content)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    return len(content)
+
+
+class ChunkedUploads:
+    """
+    Tracks in-progress chunked uploads.
+
+    Chunks are appended to a staging file under staging_dir; the final chunk
+    renames it over the target with os.replace, so readers only ever see the
+    old file or the complete new one. An upload can be dropped with abort();
+    one that receives no chunk for max_idle seconds is dropped on the next
+    write_chunk(), as are staging files left behind by an earlier process.
+    """
+
+    UPLOAD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+    def __init__(self, staging_dir: Path, max_idle: float = 3600.0):
+        self.staging_dir = staging_dir
+        self.max_idle = max_idle
+        self._uploads: Dict[str, Dict[str, Any]] = {}
+        self._swept = False
+        self._lock = threading.Lock()
+
+    def expire(self) -> List[str]:
+        """Drop uploads idle for more than max_idle seconds; returns their ids"""
+        cutoff = time.time() - self.max_idle
+        with self._lock:
+            expired = [uid for uid, upload in self._uploads.items() if upload["touched"] < cutoff]
+            stale = [self._uploads.pop(uid)["staging"] for uid in expired]
+            if not self._swept:
+                # Staging files of uploads a previous process never finished
+                self._swept = True
+                live = {upload["staging"].name for upload in self._uploads.values()}
+                for part in self.staging_dir.glob("*.part"):
+                    try:
+                        if part.name not in live and part.stat().st_mtime < cutoff:
+                            stale.append(part)
+                    except OSError:
+                        pass
+        for path in stale:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        return expired
+
+    def write_chunk(
+        self,
+        upload_id: str,
+        target: Path,
+        chunk_index: int,
+        content: str,
+        final: bool = False,
+        fsync: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Append one chunk to an upload; chunks must arrive in order from 0.
+
+        Re-sending an already received chunk is ignored, so clients can
+        safely retry. Returns the upload status after this chunk.
+        """
+        if not self.UPLOAD_ID_PATTERN.match(upload_id):
+            raise ValueError("upload_id may only contain letters, digits, '.', '_' and '-'")
+        self.expire()
+
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                if chunk_index != 0:
+                    raise ValueError(f"Unknown upload '{upload_id}' (first chunk must have chunk_index 0)")
+                self.staging_dir.mkdir(parents=True, exist_ok=True)
+                upload = {
+                    "target": target,
+                    "staging": self.staging_dir / f"{upload_id}.part",
+                    "next_index": 0,
+                    "characters": 0,
+                    "touched": time.time(),
+                    "lock": threading.Lock(),
+                }
+                upload["staging"].write_text("", encoding='utf-8')
+                self._uploads[upload_id] = upload
+            elif upload["target"] != target:
+                raise ValueError(f"Upload '{upload_id}' belongs to {upload['target'].name}")
+            upload["touched"] = time.time()
+
+        with upload["lock"]:
+            if chunk_index < upload["next_index"]:
+                return self._status(upload_id, upload, duplicate=True)
+            if chunk_index > upload["next_index"]:
+                raise ValueError(f"Expected chunk_index {upload['next_index']} for upload '{upload_id}', got {chunk_index}")
+
+            upload["characters"] += write_text_file(upload["staging"], content, append=True, fsync=fsync and final)
+            upload["next_index"] += 1
+
+            if final:
+                os.replace(upload["staging"], target)
+                with self._lock:
+                    self._uploads.pop(upload_id, None)
+            return self._status(upload_id, upload, complete=final)
+
+    def abort(self, upload_id: str) -> bool:
+        """Drop an upload and its staging file; returns False if unknown"""
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is None:
+            return False
+        try:
+            upload["staging"].unlink()
+        except OSError:
+            pass
+        return True
+
+    @staticmethod
+    def _status(upload_id: str, upload: Dict[str, Any], complete: bool = False, duplicate: bool = False) -> Dict[str, Any]:
+        return {
+            "upload_id": upload_id,
+            "chunks": upload["next_index"],
+            "characters": upload["characters"],
+            "complete": complete,
+            "duplicate": duplicate,
+        }
+
+
+class DirectoryIndex:
+    """
+    In-memory, sorted index of the files directly inside one directory.
+
+    The index is rebuilt only when the directory's mtime changes (a file was
+    created, removed or renamed by someone else); the servers' own writes
+    are wrapped in tracking(), which updates the index in place. A directory
+    mtime within RACY_SECONDS of "now" is never trusted, so a list() right
+    after a tracked create or delete still rescans once; rewrites of existing
+    files leave the directory mtime alone and never do. Size/mtime metadata
+    is stat'ed once per file and cached until the next rescan or tracked
+    write, so it can lag behind in-place edits made by other processes.
+    """
+
+    # A directory mtime this close to "now" may hide a second change made in
+    # the same timestamp tick, so the next lookup rescans to be safe
+    RACY_SECONDS = 0.05
+    # Filesystems with whole-second mtimes need a much wider window
+    RACY_SECONDS_COARSE = 2.0
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._names: List[str] = []
+        self._meta: Dict[str, Optional[Tuple[int, float]]] = {}
+        self._dir_mtime_ns: Optional[int] = None
+        self._racy = True
+        self._lock = threading.Lock()
+
+    def _adopt_mtime(self, mtime_ns: int):
+        self._dir_mtime_ns = mtime_ns
+        window = self.RACY_SECONDS if mtime_ns % 1_000_000_000 else self.RACY_SECONDS_COARSE
+        self._racy = time.time() - mtime_ns / 1e9 < window
+
+    def _refresh(self):
+        try:
+            mtime_ns = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            self._names, self._meta, self._dir_mtime_ns = [], {}, None
+            return
+        if mtime_ns == self._dir_mtime_ns and not self._racy:
+            return
+
+        # DirEntry.is_file() uses the type from readdir, so no stat per file
+        with os.scandir(self.directory) as entries:
+            meta: Dict[str, Optional[Tuple[int, float]]] = {
+                entry.name: None for entry in entries if entry.is_file()
+            }
+        self._meta = meta
+        self._names = sorted(meta)
+        self._adopt_mtime(mtime_ns)
+
+    def _stat(self, name: str) -> Optional[Tuple[int, float]]:
+        info = self._meta.get(name)
+        if info is None:
+            try:
+                st = os.stat(self.directory / name)
+            except OSError:
+                return None
+            info = (st.st_size, st.st_mtime)
+            self._meta[name] = info
+        return info
+
+    @contextmanager
+    def tracking(self, filepath: Path):
+        """
+        Wrap a write to filepath so the index absorbs it without a rescan.
+
+        The index is brought up to date before the write; afterwards the
+        file's entry is updated and the directory mtime is adopted. If the
+        write created or removed the file, that mtime is fresh enough to
+        hide a concurrent change by another process, so the next list()
+        rescans anyway; this is deliberate, not a missed update.
+        """
+        tracked = filepath.parent.resolve() == self.directory.resolve()
+        if tracked:
+            with self._lock:
+                self._refresh()
+        yield
+        if not tracked:
+            return
+        with self._lock:
+            if self._dir_mtime_ns is None:
+                return
+            name = filepath.name
+            known = name in self._meta
+            self._meta[name] = None
+            if self._stat(name) is None:
+                # Nothing landed (e.g. a non-final upload chunk)
+                del self._meta[name]
+                if known:
+                    self._names.remove(name)
+            elif not known:
+                bisect.insort(self._names, name)
+            try:
+                self._adopt_mtime(os.stat(self.directory).st_mtime_ns)
+            except OSError:
+                self._dir_mtime_ns = None
+
+    def list(
+        self,
+        pattern: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        details: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Return one page of files in name order.
+
+        Args:
+            pattern: Optional glob (fnmatch) filter on the file name
+            cursor: Return names after this one (the previous page's cursor)
+            limit: Page size (at least 1); None returns everything
+            details: Include cached size and mtime for each file
+
+        Returns:
+            (entries, next_cursor) where next_cursor is None on the last page
+
+        Raises:
+            ValueError: If limit is less than 1
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be >= 1")
+
+        with self._lock:
+            self._refresh()
+            start = bisect.bisect_right(self._names, cursor) if cursor else 0
+
+            entries: List[Dict[str, Any]] = []
+            next_cursor = None
+            for name in itertools.islice(self._names, start, None):
+                if pattern and not fnmatch.fnmatch(name, pattern):
+                    continue
+                if limit is not None and len(entries) >= limit:
+                    next_cursor = entries[-1]["name"]
+                    break
+                entry: Dict[str, Any] = {"name": name}
+                if details:
+                    info = self._stat(name)
+                    if info:
+                        entry["size"], entry["mtime"] = info
+                entries.append(entry)
+            return entries, next_cursor
+
+
+class AppendLog:
+    """
+    Append-only text log whose entries carry a sequence number.
+
+    Each append opens the file in append mode and writes one line, so the
+    cost is independent of the file size. When the file grows past
+    max_bytes it is renamed to a numbered segment (NAME.0001.TXT, ...) and
+    a fresh file starting with the header is created; sequence numbers keep
+    counting across segments so readers can resume from the last one seen.
+    """
+
+    LINE_PATTERN = re.compile(rb'^\[[^\]\n]*\] \[#(\d+)\]', re.MULTILINE)
+    # How much of a file's tail is scanned to recover the last sequence number
+    TAIL_BYTES = 64 * 1024
+
+    def __init__(self, path: Path, header: str, max_bytes: int = 0):
+        self.path = path
+        self.header = header
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._seq: Optional[int] = None
+
+    def _numbered_segments(self) -> List[Tuple[int, Path]]:
+        pattern = re.compile(re.escape(self.path.stem) + r'\.(\d{4,})' + re.escape(self.path.suffix) + '$')
+        found = []
+        for p in self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}"):
+            m = pattern.match(p.name)
+            if m:
+                found.append((int(m.group(1)), p))
+        return sorted(found)
+
+    def segments(self) -> List[Path]:
+        """Rotated segments, oldest first"""
+        return [p for _, p in self._numbered_segments()]
+
+    @classmethod
+    def _last_seq_in(cls, path: Path) -> Optional[int]:
+        try:
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                f.seek(max(0, size - cls.TAIL_BYTES))
+                tail = f.read()
+        except OSError:
+            return None
+        matches = cls.LINE_PATTERN.findall(tail)
+        return int(matches[-1]) if matches else None
+
+    def _recover_seq(self) -> int:
+        last = self._last_seq_in(self.path)
+        if last is None:
+            for segment in reversed(self.segments()):
+                last = self._last_seq_in(segment)
+                if last is not None:
+                    break
+        return last or 0
+
+    def _rotate(self):
+        numbered = self._numbered_segments()
+        next_number = numbered[-1][0] + 1 if numbered else 1
+        os.replace(self.path, self.path.with_name(f"{self.path.stem}.{next_number:04d}{self.path.suffix}"))
+        write_text_file(self.path, self.header)
+
+    def append(self, text: str) -> Tuple[int, str]:
+        """
+        Append one entry ("[timestamp] [#seq] text").
+
+        Returns:
+            (sequence number, timestamp) of the new entry
+        """
+        with self._lock:
+            if self._seq is None:
+                self._seq = self._recover_seq()
+
+            try:
+                size = self.path.stat().st_size
+            except OSError:
+                size = -1
+            if size < 0:
+                write_text_file(self.path, self.header)
+            elif self.max_bytes > 0 and size >= self.max_bytes:
+                self._rotate()
+
+            seq = self._seq + 1
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            write_text_file(self.path, f"[{timestamp}] [#{seq}] {text}\n", append=True)
+            self._seq = seq
+            return seq, timestamp
+
+
+class AppendLogReader:
+    """
+    Incremental reader for a file written in AppendLog's entry format.
+
+    Keeps a seq -> byte offset table that is extended only with bytes added
+    since the previous call, so resuming "after message #N" seeks straight
+    to the right place instead of rescanning the file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._seqs: List[int] = []
+        self._starts: List[int] = []
+        self._scanned = 0
+        # True while _scanned is inside a line longer than one read
+        self._midline = False
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            size = 0
+        if size < self._scanned:
+            # File was truncated or replaced: forget everything
+            self._seqs, self._starts, self._scanned, self._midline = [], [], 0, False
+        while self._scanned < size:
+            data, _ = read_lines_since(self.path, self._scanned)
+            if not data:
+                break  # only an unterminated last line is left
+            start = 0
+            if self._midline:
+                # Rest of an over-long line: only entries after its newline count
+                start = data.find(b'\n') + 1 or len(data)
+            for m in AppendLog.LINE_PATTERN.finditer(data, start):
+                seq = int(m.group(1))
+                if not self._seqs or seq > self._seqs[-1]:
+                    self._seqs.append(seq)
+                    self._starts.append(self._scanned + m.start())
+            self._midline = not data.endswith(b'\n')
+            self._scanned += len(data)
+
+    def _tail_entry(self) -> Tuple[Optional[int], int]:
+        """Sequence number and end offset of an unterminated last entry, if any"""
+        if self._midline:
+            return None, self._scanned
+        try:
+            with open(self.path, 'rb') as f:
+                end = os.fstat(f.fileno()).st_size
+                f.seek(self._scanned)
+                head = f.read(256)
+        except OSError:
+            return None, self._scanned
+        m = AppendLog.LINE_PATTERN.match(head)
+        return (int(m.group(1)) if m else None), end
+
+    def offset_after(self, seq: int) -> int:
+        """
+        Byte offset of the first entry with a sequence number above seq.
+
+        Raises:
+            ValueError: If the file holds no [#N] entries at all, so there
+                is nothing to resume from (the writer does not number them)
+        """
+        with self._lock:
+            self._scan()
+            i = bisect.bisect_right(self._seqs, seq)
+            if i < len(self._starts):
+                return self._starts[i]
+            # A reader may already have the unterminated last entry (see settle)
+            tail_seq, end = self._tail_entry()
+            if not self._seqs and tail_seq is None:
+                raise ValueError(f"{self.path.name} has no [#N] entries to resume from; use since instead")
+            return end if tail_seq is not None and tail_seq <= seq else self._scanned
+
+    @staticmethod
+    def last_seq(data: bytes) -> Optional[int]:
+        """Highest sequence number among the entries in data, if any"""
+        matches = AppendLog.LINE_PATTERN.findall(data)
+        return int(matches[-1]) if matches else None
+
+
+# inotify event mask for "a file in this directory changed or appeared"
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_WATCH_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_libc = None
+
+
+def _inotify_libc():
+    """Return libc with inotify bound, or None where it is unavailable"""
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith('linux'):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                libc.inotify_init1.argtypes = [ctypes.c_int]
+                libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                _libc = libc
+            except (OSError, AttributeError):
+                pass
+    return _libc or None
+
+
+def _stat_or_none(filepath: Path) -> Optional[os.stat_result]:
+    try:
+        return os.stat(filepath)
+    except OSError:
+        return None
+
+
+def wait_for_file_change(
+    filepath: Path,
+    changed: Callable[[Optional[os.stat_result]], bool],
+    timeout: float,
+    poll_interval: float = 0.05,
+    recheck: Optional[float] = None,
+) -> bool:
+    """
+    Block until changed(stat of filepath) is True or timeout seconds pass.
+
+    On Linux the parent directory is watched with inotify, so the check
+    re-runs as soon as anything in it is written, created or renamed into
+    place; elsewhere (or if inotify fails) the file is stat-polled every
+    poll_interval seconds. A check that can also turn True with time alone
+    (e.g. "the file has been quiet for a while") passes recheck to re-run
+    it at least that often without an event.
+
+    Returns:
+        True if the change was seen, False on timeout
+    """
+    deadline = time.monotonic() + timeout
+    if changed(_stat_or_none(filepath)):
+        return True
+
+    fd = -1
+    libc = _inotify_libc()
+    if libc is not None:
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(filepath.parent), _IN_WATCH_MASK) < 0:
+            os.close(fd)
+            fd = -1
+
+    try:
+        # A write that landed between the first check and the watch raised no event
+        if fd >= 0 and changed(_stat_or_none(filepath)):
+            return True
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if fd >= 0:
+                ready, _, _ = select.select([fd], [], [], remaining if recheck is None else min(recheck, remaining))
+                if ready:
+                    try:
+                        os.read(fd, 64 * 1024)  # drain; any event means re-check
+                    except BlockingIOError:
+                        pass
+            else:
+                time.sleep(min(poll_interval, remaining))
+            if changed(_stat_or_none(filepath)):
+                return True
+    finally:
+        if fd >= 0:
+            os.close(fd)
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+JSON-RPC message framing for the MCP stdio transports
+
+Both framings seen on stdio are accepted, detected per message from its
+first byte:
+
+    NDJSON          one JSON object or batch array per line ('{' or '[' first)
+    Content-Length  'Content-Length: N' header block, blank line, N bytes of JSON
+
+Everything works on bytes (sys.stdin.buffer / sys.stdout.buffer), so
+Content-Length counts bytes as the header means, and frames are decoded
+straight out of one reusable buffer without splitting it into per-line
+strings. orjson is used for encoding/decoding when installed, with the
+stdlib json module as the fallback.
+"""
+
+import argparse
+import io
+import json
+import threading
+import time
+from typing import Any, BinaryIO, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NDJSON = "ndjson"
+CONTENT_LENGTH = "content-length"
+FRAMINGS = (NDJSON, CONTENT_LENGTH)
+
+# Largest frame (line or body) accepted; anything longer is skipped
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+# Largest Content-Length header block accepted
+MAX_HEADER_BYTES = 8 * 1024
+
+# Bytes requested per read from the underlying stream
+CHUNK_SIZE = 256 * 1024
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+_WHITESPACE = b' \t\r\n'
+_JSON_START = b'{['
+
+
+class FrameError(ValueError):
+    """A malformed or oversized frame; the decoder has already skipped past it"""
+
+
+# Stdlib codec objects, built once instead of per call as json.loads/dumps would
+_json_decode = json.JSONDecoder().decode
+_json_encode = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def loads(data) -> Any:
+    """Decode UTF-8 JSON from bytes, bytearray or memoryview"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return _json_decode(str(data, 'utf-8'))
+
+
+def dumps(message: Any) -> bytes:
+    """Encode a message as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(message)
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits, which the stdlib encoder handles
+    return _json_encode(message).encode('utf-8')
+
+
+def encode_frame(message: Any, framing: str = NDJSON) -> bytes:
+    """Serialize one message (object or batch array) into a complete frame"""
+    body = dumps(message)
+    if framing == CONTENT_LENGTH:
+        return b'Content-Length: %d\r\n\r\n' % len(body) + body
+    return body + b'\n'
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for a byte stream of NDJSON and/or Content-Length frames.
+
+    feed() appends raw bytes; next_message() returns the next complete
+    message, or None until more bytes arrive. Consumed bytes are dropped
+    from the front of the buffer only once they make up half of it, so a
+    stream of small messages is parsed without reallocating per message.
+    """
+
+    def __init__(self, max_frame: int = MAX_FRAME_BYTES):
+        self.max_frame = max_frame
+        self.last_framing: Optional[str] = None
+        self._buf = bytearray()
+        self._pos = 0
+        # Where to resume looking for the end of a partial NDJSON line
+        self._scan = 0
+        # Bytes still to drop from an oversized frame, or -1 to drop through the next newline
+        self._skip = 0
+
+    def feed(self, data: bytes):
+        """Append bytes read from the stream"""
+        if self._pos and self._pos * 2 >= len(self._buf):
+            del self._buf[:self._pos]
+            self._scan = max(0, self._scan - self._pos)
+            self._pos = 0
+        self._buf += data
+
+    def buffered(self) -> int:
+        """Bytes received but not consumed yet"""
+        return len(self._buf) - self._pos
+
+    def next_message(self) -> Any:
+        """
+        Decode the next complete message from the buffer.
+
+        Returns:
+            The message, or None if no complete frame is buffered yet
+
+        Raises:
+            FrameError: For a malformed or oversized frame (it is skipped)
+            ValueError: If a complete frame is not valid JSON (it is skipped)
+        """
+        buf = self._buf
+        end = len(buf)
+        if self._skip and not self._discard():
+            return None
+
+        pos = self._pos
+        while pos < end and buf[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        if pos == end:
+            return None
+
+        if buf[pos] in _JSON_START:
+            return self._next_line(pos, end)
+        return self._next_content_length(pos, end)
+
+    def _discard(self) -> bool:
+        """Drop the rest of an oversized frame; True once it is gone"""
+        buf = self._buf
+        if self._skip > 0:
+            dropped = min(self._skip, len(buf) - self._pos)
+            self._pos += dropped
+            self._skip -= dropped
+        else:
+            newline = buf.find(b'\n', self._pos)
+            if newline < 0:
+                self._pos = len(buf)
+                return False
+            self._pos = newline + 1
+            self._skip = 0
+        return self._skip == 0
+
+    def _next_line(self, pos: int, end: int) -> Any:
+        newline = self._buf.find(b'\n', max(pos, self._scan))
+        if newline < 0:
+            self._scan = end
+            if end - pos > self.max_frame:
+                self._pos = end
+                self._skip = -1
+                raise FrameError(f"NDJSON line longer than {self.max_frame} bytes")
+            return None
+
+        self._pos = self._scan = newline + 1
+        self.last_framing = NDJSON
+        return loads(self._buf[pos:newline])
+
+    def _next_content_length(self, pos: int, end: int) -> Any:
+        buf = self._buf
+        length = None
+        line_start = pos
+
+        # Fast path for the usual single 'Content-Length: N\r\n\r\n' header
+        if buf.startswith(b'Content-Length:', pos):
+            header_end = buf.find(b'\r\n\r\n', pos, pos + MAX_HEADER_BYTES)
+            if header_end >= 0 and buf.find(b'\n', pos, header_end) < 0:
+                try:
+                    length = int(buf[pos + 15:header_end])
+                except ValueError:
+                    length = -1
+                line_start = header_end + 4
+
+        if length is None:
+            while True:
+                eol = buf.find(b'\n', line_start, pos + MAX_HEADER_BYTES)
+                if eol < 0:
+                    if end - pos >= MAX_HEADER_BYTES:
+                        self._pos = end
+                        self._skip = -1
+                        raise FrameError("Frame header too long")
+                    return None
+                line = bytes(buf[line_start:eol]).strip()
+                line_start = eol + 1
+                if not line:
+                    break
+                name, sep, value = line.partition(b':')
+                if not sep:
+                    self._pos = line_start
+                    raise FrameError(f"Unexpected input: {line[:80].decode('utf-8', 'replace')}")
+                if name.strip().lower() == b'content-length':
+                    try:
+                        length = int(value)
+                    except ValueError:
+                        length = -1
+
+        if length is None or length < 0:
+            self._pos = line_start
+            raise FrameError("Header block without a valid Content-Length")
+        if length > self.max_frame:
+            self._pos = line_start
+            self._skip = length
+            raise FrameError(f"Content-Length {length} exceeds {self.max_frame} bytes")
+
+        body_end = line_start + length
+        if body_end > end:
+            return None
+        self._pos = self._scan = body_end
+        self.last_framing = CONTENT_LENGTH
+        return loads(buf[line_start:body_end])
+
+
+
+class FrameReader:
+    """
+    Blocking message reader over a binary stream (e.g. sys.stdin.buffer).
+
+    Reads whatever the stream has available (up to CHUNK_SIZE) and decodes
+    every complete frame in it before reading again.
+    """
+
+    def __init__(self, stream: BinaryIO, max_frame: int = MAX_FRAME_BYTES):
+        self.stream = stream
+        self.decoder = FrameDecoder(max_frame)
+        self._read = getattr(stream, 'read1', stream.read)
+
+    @property
+    def last_framing(self) -> Optional[str]:
+        """Framing of the most recently decoded message"""
+        return self.decoder.last_framing
+
+    def read_message(self) -> Any:
+        """
+        Return the next message, blocking until one is complete, or None at EOF.
+
+        Raises:
+            ValueError: For a malformed frame (including FrameError); reading can go on
+        """
+        decoder = self.decoder
+        while True:
+            message = decoder.next_message()
+            if message is not None:
+                return message
+            chunk = self._read(CHUNK_SIZE)
+            if not chunk:
+                if decoder.buffered() and not decoder._skip:
+                    decoder.feed(b'\n')  # a last NDJSON line without its newline
+                    message = decoder.next_message()
+                    if message is not None:
+                        return message
+                return None
+            decoder.feed(chunk)
+
+
+class FrameWriter:
+    """Thread-safe frame writer over a binary stream (e.g. sys.stdout.buffer)"""
+
+    def __init__(self, stream: BinaryIO, framing: str = NDJSON):
+        self.stream = stream
+        self.framing = framing
+        self._lock = threading.Lock()
+
+    def write_message(self, message: Any, framing: Optional[str] = None) -> int:
+        """Write one message as a single frame and flush; returns the bytes written"""
+        data = encode_frame(message, framing or self.framing)
+        with self._lock:
+            self.stream.write(data)
+            self.stream.flush()
+        return len(data)
+
+
+def _sample_messages(count: int):
+    """Typical traffic: tools/call requests and text results of mixed sizes"""
+    text = "línea de ejemplo, ação ✓ " * 8
+    for i in range(count):
+        if i % 2:
+            yield {"jsonrpc": "2.0", "id": i, "method": "tools/call",
+                   "params": {"name": "read_file", "arguments": {"path": f"notes/{i}.txt"}}}
+        else:
+            yield {"jsonrpc": "2.0", "id": i, "result": {
+                "content": [{"type": "text", "text": text * (1 + i % 16)}], "isError": False}}
+
+
+def _legacy_read(stream: io.TextIOBase):
+    """The servers' former text-mode reader: readline, strip, then json.loads"""
+    while True:
+        first_line = stream.readline().strip()
+        if not first_line:
+            return
+        if "Content-Length:" in first_line:
+            content_length = int(first_line.split(":", 1)[1].strip())
+            stream.readline()
+            yield json.loads(stream.read(content_length))
+        else:
+            yield json.loads(first_line)
+
+
+def _benchmark_backend(messages, repeat: int) -> None:
+    """Print encode/decode throughput of both framings with the current JSON backend"""
+    count = len(messages)
+    for framing in FRAMINGS:
+        best_encode = best_decode = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = b''.join(encode_frame(m, framing) for m in messages)
+            best_encode = min(best_encode, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            reader = FrameReader(io.BufferedReader(io.BytesIO(data)))
+            decoded = 0
+            while reader.read_message() is not None:
+                decoded += 1
+            best_decode = min(best_decode, time.perf_counter() - start)
+        assert decoded == count, f"decoded {decoded} of {count}"
+
+        megabytes = len(data) / 1e6
+        print(f"  {framing:<15} {megabytes:6.1f} MB  "
+              f"encode {megabytes / best_encode:7.1f} MB/s {count / best_encode:9.0f} msg/s  "
+              f"decode {megabytes / best_decode:7.1f} MB/s {count / best_decode:9.0f} msg/s")
+
+
+def run_benchmark(count: int = 20000, repeat: int = 5) -> None:
+    """
+    Measure encode and decode throughput for both framings.
+
+    Decoding goes through FrameReader over an in-memory binary stream, with
+    orjson (when installed) and with the stdlib json module. The servers'
+    former text-mode line reader is timed on the same NDJSON input for
+    comparison. Reports the best of `repeat` runs.
+    """
+    global orjson
+    messages = list(_sample_messages(count))
+    print(f"{count} messages, best of {repeat} runs")
+
+    installed = orjson
+    for backend in (("orjson", installed), ("json", None)):
+        if backend[0] == "orjson" and installed is None:
+            print("\norjson: not installed")
+            continue
+        orjson = backend[1]
+        try:
+            print(f"\n{backend[0]}:")
+            _benchmark_backend(messages, repeat)
+        finally:
+            orjson = installed
+
+    data = b''.join(json.dumps(m).encode('utf-8') + b'\n' for m in messages)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoded = sum(1 for _ in _legacy_read(io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')))
+        best = min(best, time.perf_counter() - start)
+    print(f"\nFormer text-mode reader (NDJSON, json): decode {len(data) / 1e6 / best:7.1f} MB/s "
+          f"{count / best:9.0f} msg/s")
+
+
+def main():
+    """Command line entry point (benchmark only)"""
+    parser = argparse.ArgumentParser(description="MCP stdio message framing")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Measure encode/decode throughput of both framings")
+    parser.add_argument('--messages', type=int, default=20000, help="Messages per run (default 20000)")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per framing (default 5)")
+    args = parser.parse_args()
+    if not args.benchmark:
+        parser.print_help()
+        return
+    run_benchmark(args.messages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+"""
+Technical indicators for the MCP server's market data tools
+
+Python ports of calculateEMA, calculateBollingerBands, calculateRSI and
+calculateMACD from site/crypto_functions.php. Results match the PHP
+functions (None where PHP returns null) but every indicator is a single
+O(n) pass; Bollinger bands use a rolling sum and sum of squares instead of
+re-reading each window.
+
+IndicatorStream keeps the same indicators as O(1)-per-candle state, and
+IndicatorCache persists that state (with the values computed so far) so
+appended candles never trigger a full recompute, even across restarts.
+
+Run directly to benchmark against the per-window loop:
+    python mcp_indicators.py --benchmark [PAIR ...]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Sequence as SequenceABC
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+Series = List[Optional[float]]
+
+# Indicator names accepted by the indicators tool, in output order
+INDICATORS = ("ema", "bollinger", "rsi", "macd")
+
+# Price series an indicator can be computed on; 'mid' is the site's crypto_price
+PRICE_SOURCES = ("mid", "open", "high", "low", "close")
+
+DEFAULTS = {
+    "ema_period": 20,
+    "bb_period": 20,
+    "bb_std_dev": 2.0,
+    "rsi_period": 14,
+    "macd_fast": 12,
+    "macd_slow": 26,
+    "macd_signal": 9,
+}
+
+
+def price_series(columns: Dict[str, Sequence[float]], source: str = "mid") -> List[float]:
+    """Pick (or derive) the price series an indicator runs on"""
+    if source == "mid":
+        return [(o + c) / 2 for o, c in zip(columns["open"], columns["close"])]
+    if source not in PRICE_SOURCES:
+        raise ValueError(f"price must be one of {', '.join(PRICE_SOURCES)}")
+    return list(columns[source])
+
+
+def ema(data: Sequence[Optional[float]], period: int) -> Series:
+    """
+    Exponential moving average, seeded with the SMA of the first `period` values.
+
+    Mirrors calculateEMA: None inputs carry the previous EMA forward, and
+    a None seed behaves like PHP's null (0) once real values arrive, which
+    is what MACD's signal line relies on.
+    """
+    if period < 1:
+        raise ValueError("period must be >= 1")
+    n = len(data)
+    result: Series = [None] * n
+    if n < period:
+        return result
+
+    seed = [x for x in data[:period] if x is not None]
+    prev = sum(seed) / len(seed) if seed else None
+    result[period - 1] = prev
+    k = 2 / (period + 1)
+
+    for i in range(period, n):
+        x = data[i]
+        if x is not None:
+            base = prev or 0.0
+            prev = (x - base) * k + base
+        result[i] = prev
+    return result
+
+
+def bollinger_bands(prices: Sequence[float], period: int = 20, std_dev: float = 2.0) -> Dict[str, Series]:
+    """
+    SMA middle band with bands std_dev population standard deviations away.
+
+    Keeps a rolling sum and sum of squares (of prices minus the first price,
+    to limit cancellation on large quotes) so each window costs O(1).
+    """
+    if period < 1:
+        raise ValueError("period must be >= 1")
+    n = len(prices)
+    upper: Series = [None] * n
+    middle: Series = [None] * n
+    lower: Series = [None] * n
+    if n < period:
+        return {"upper": upper, "middle": middle, "lower": lower}
+
+    ref = prices[0]
+    total = 0.0
+    total_sq = 0.0
+    for i, price in enumerate(prices):
+        d = price - ref
+        total += d
+        total_sq += d * d
+        if i >= period:
+            old = prices[i - period] - ref
+            total -= old
+            total_sq -= old * old
+        if i >= period - 1:
+            mean = total / period
+            std = math.sqrt(max(0.0, total_sq / period - mean * mean))
+            sma = ref + mean
+            middle[i] = sma
+            upper[i] = sma + std_dev * std
+            lower[i] = sma - std_dev * std
+    return {"upper": upper, "middle": middle, "lower": lower}
+
+
+def rsi(prices: Sequence[float], period: int = 14) -> Series:
+    """Relative strength index with Wilder smoothing, as calculateRSI"""
+    if period < 1:
+        raise ValueError("period must be >= 1")
+    n = len(prices)
+    result: Series = [None] * n
+    if n < period + 1:
+        return result
+
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, period + 1):
+        change = prices[i] - prices[i - 1]
+        if change > 0:
+            avg_gain += change
+        else:
+            avg_loss -= change
+    avg_gain /= period
+    avg_loss /= period
+
+    for i in range(period, n):
+        result[i] = 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+        if i + 1 < n:
+            change = prices[i + 1] - prices[i]
+            avg_gain = (avg_gain * (period - 1) + max(change, 0.0)) / period
+            avg_loss = (avg_loss * (period - 1) + max(-change, 0.0)) / period
+    return result
+
+
+def macd(prices: Sequence[float], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, Series]:
+    """MACD line (fast EMA - slow EMA), its signal EMA and the histogram, as calculateMACD"""
+    macd_line = [
+        None if f is None or s is None else f - s
+        for f, s in zip(ema(prices, fast), ema(prices, slow))
+    ]
+    signal_line = ema(macd_line, signal)
+    histogram = [
+        None if m is None or s is None else m - s
+        for m, s in zip(macd_line, signal_line)
+    ]
+    return {"macd": macd_line, "signal": signal_line, "histogram": histogram}
+
+
+def resolve_params(params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """DEFAULTS overridden by the non-None entries of params, with periods as ints"""
+    resolved: Dict[str, Any] = dict(DEFAULTS)
+    resolved.update({k: v for k, v in (params or {}).items() if k in DEFAULTS and v is not None})
+    return {k: float(v) if k == "bb_std_dev" else int(v) for k, v in resolved.items()}
+
+
+def compute(prices: Sequence[float], names: Sequence[str], params: Optional[Dict[str, Any]] = None) -> Dict[str, Series]:
+    """
+    Compute the named indicators into flat, prefixed output columns.
+
+    Returns:
+        Column name -> series, e.g. ema, bb_upper, bb_middle, bb_lower, rsi,
+        macd, macd_signal, macd_histogram
+    """
+    p = resolve_params(params)
+    out: Dict[str, Series] = {}
+    for name in names:
+        if name == "ema":
+            out["ema"] = ema(prices, p["ema_period"])
+        elif name == "bollinger":
+            bands = bollinger_bands(prices, p["bb_period"], p["bb_std_dev"])
+            out.update({f"bb_{band}": values for band, values in bands.items()})
+        elif name == "rsi":
+            out["rsi"] = rsi(prices, p["rsi_period"])
+        elif name == "macd":
+            lines = macd(prices, p["macd_fast"], p["macd_slow"], p["macd_signal"])
+            out["macd"] = lines["macd"]
+            out["macd_signal"] = lines["signal"]
+            out["macd_histogram"] = lines["histogram"]
+        else:
+            raise ValueError(f"Unknown indicator: {name} (choose from {', '.join(INDICATORS)})")
+    return out
+
+
+class EmaState:
+    """Streaming ema(): SMA seed over the first `period` values, then one update per value"""
+
+    def __init__(self, period: int, index: int = 0, seed_sum: float = 0.0, seed_count: int = 0,
+                 value: Optional[float] = None):
+        if period < 1:
+            raise ValueError("period must be >= 1")
+        self.period = period
+        self.index = index
+        self.seed_sum = seed_sum
+        self.seed_count = seed_count
+        self.value = value
+
+    def update(self, x: Optional[float]) -> Optional[float]:
+        i = self.index
+        self.index += 1
+        if i < self.period:
+            if x is not None:
+                self.seed_sum += x
+                self.seed_count += 1
+            if i < self.period - 1:
+                return None
+            self.value = self.seed_sum / self.seed_count if self.seed_count else None
+        elif x is not None:
+            base = self.value or 0.0
+            self.value = (x - base) * (2 / (self.period + 1)) + base
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class BollingerState:
+    """Streaming bollinger_bands(): the last `period` prices plus their rolling sum and sum of squares"""
+
+    def __init__(self, period: int, std_dev: float, window: Optional[List[float]] = None,
+                 ref: Optional[float] = None, total: float = 0.0, total_sq: float = 0.0):
+        if period < 1:
+            raise ValueError("period must be >= 1")
+        self.period = period
+        self.std_dev = std_dev
+        self.window = deque(window or [], maxlen=period)
+        self.ref = ref
+        self.total = total
+        self.total_sq = total_sq
+
+    def update(self, price: float) -> Dict[str, Optional[float]]:
+        if self.ref is None:
+            self.ref = price
+        if len(self.window) == self.period:
+            old = self.window[0] - self.ref
+            self.total -= old
+            self.total_sq -= old * old
+        self.window.append(price)
+        d = price - self.ref
+        self.total += d
+        self.total_sq += d * d
+        if len(self.window) < self.period:
+            return {"upper": None, "middle": None, "lower": None}
+        mean = self.total / self.period
+        std = math.sqrt(max(0.0, self.total_sq / self.period - mean * mean))
+        sma = self.ref + mean
+        return {"upper": sma + self.std_dev * std, "middle": sma, "lower": sma - self.std_dev * std}
+
+    def to_dict(self) -> Dict[str, Any]:
+        state = dict(vars(self))
+        state["window"] = list(self.window)
+        return state
+
+
+class RsiState:
+    """Streaming rsi(): previous price and Wilder average gain/loss"""
+
+    def __init__(self, period: int, index: int = 0, prev: Optional[float] = None,
+                 avg_gain: float = 0.0, avg_loss: float = 0.0):
+        if period < 1:
+            raise ValueError("period must be >= 1")
+        self.period = period
+        self.index = index
+        self.prev = prev
+        self.avg_gain = avg_gain
+        self.avg_loss = avg_loss
+
+    def update(self, price: float) -> Optional[float]:
+        i = self.index
+        self.index += 1
+        change = 0.0 if self.prev is None else price - self.prev
+        self.prev = price
+        if i == 0:
+            return None
+        if i <= self.period:
+            # Initial averages: plain mean of the first `period` changes
+            if change > 0:
+                self.avg_gain += change
+            else:
+                self.avg_loss -= change
+            if i < self.period:
+                return None
+            self.avg_gain /= self.period
+            self.avg_loss /= self.period
+        else:
+            self.avg_gain = (self.avg_gain * (self.period - 1) + max(change, 0.0)) / self.period
+            self.avg_loss = (self.avg_loss * (self.period - 1) + max(-change, 0.0)) / self.period
+        return 100.0 if self.avg_loss == 0 else 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class IndicatorStream:
+    """
+    O(1)-per-candle version of compute(): feed prices one at a time.
+
+    Produces the same columns as compute() for the same names and params,
+    and round-trips through to_dict()/from_dict() as plain JSON.
+    """
+
+    def __init__(self, names: Sequence[str], params: Optional[Dict[str, Any]] = None,
+                 states: Optional[Dict[str, Any]] = None):
+        unknown = [name for name in names if name not in INDICATORS]
+        if unknown:
+            raise ValueError(f"Unknown indicator: {unknown[0]} (choose from {', '.join(INDICATORS)})")
+        self.names = list(names)
+        self.params = resolve_params(params)
+        p = self.params
+        states = states or {}
+
+        def restore(key: str, cls, **defaults):
+            return cls(**(states.get(key) or defaults))
+
+        self.states: Dict[str, Any] = {}
+        if "ema" in self.names:
+            self.states["ema"] = restore("ema", EmaState, period=p["ema_period"])
+        if "bollinger" in self.names:
+            self.states["bollinger"] = restore("bollinger", BollingerState,
+                                               period=p["bb_period"], std_dev=p["bb_std_dev"])
+        if "rsi" in self.names:
+            self.states["rsi"] = restore("rsi", RsiState, period=p["rsi_period"])
+        if "macd" in self.names:
+            self.states["macd_fast"] = restore("macd_fast", EmaState, period=p["macd_fast"])
+            self.states["macd_slow"] = restore("macd_slow", EmaState, period=p["macd_slow"])
+            self.states["macd_signal"] = restore("macd_signal", EmaState, period=p["macd_signal"])
+
+    def update(self, price: float) -> Dict[str, Optional[float]]:
+        """Absorb one price and return this candle's value for every output column"""
+        row: Dict[str, Optional[float]] = {}
+        for name in self.names:
+            if name == "ema":
+                row["ema"] = self.states["ema"].update(price)
+            elif name == "bollinger":
+                bands = self.states["bollinger"].update(price)
+                row.update({f"bb_{band}": value for band, value in bands.items()})
+            elif name == "rsi":
+                row["rsi"] = self.states["rsi"].update(price)
+            elif name == "macd":
+                fast = self.states["macd_fast"].update(price)
+                slow = self.states["macd_slow"].update(price)
+                line = None if fast is None or slow is None else fast - slow
+                signal = self.states["macd_signal"].update(line)
+                row["macd"] = line
+                row["macd_signal"] = signal
+                row["macd_histogram"] = None if line is None or signal is None else line - signal
+        return row
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "names": self.names,
+            "params": self.params,
+            "states": {key: state.to_dict() for key, state in self.states.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndicatorStream":
+        return cls(data["names"], data["params"], data["states"])
+
+
+class _Appended(SequenceABC):
+    """A cached column plus the newest candle's value, without copying the column"""
+
+    __slots__ = ("base", "count", "last")
+
+    def __init__(self, base: Series, last: Optional[float]):
+        self.base = base
+        self.count = len(base)  # the cache may append to base later
+        self.last = last
+
+    def __len__(self) -> int:
+        return self.count + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count + 1)
+            if step == 1 and stop <= self.count:
+                return self.base[start:stop]
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += self.count + 1
+        if index == self.count:
+            return self.last
+        if not 0 <= index < self.count:
+            raise IndexError("indicator index out of range")
+        return self.base[index]
+
+
+class IndicatorCache:
+    """
+    Indicator values per (pair, interval, price, indicators, params), extended incrementally.
+
+    Each entry holds the IndicatorStream state after the last "settled"
+    candle (every candle but the newest, which may still be a partial
+    resampled bucket) together with the values computed so far. If a CRC-32
+    of the settled candles' times and prices still matches, only newer
+    candles are fed through the stream; otherwise (a rewritten CSV,
+    different history) everything is recomputed. The CRC runs in C over
+    the packed columns, a few ms for a long history, against the
+    Python-speed update it saves.
+
+    Entries are kept in memory (LRU, max_entries) and, when directory is
+    set, saved there so a restarted server picks up where it was: a small
+    KEY.json with the stream state, and KEY.ind with the values as float64
+    rows (NaN for None) to which new candles are appended. The files take
+    part in the same LRU: an entry's files are deleted when it is evicted,
+    and on first use only the max_entries most recent files are kept.
+    """
+
+    VERSION = 3
+
+    def __init__(self, directory: Optional[Path] = None, max_entries: int = 32):
+        self.directory = directory
+        self.max_entries = max(1, max_entries)
+        # key id -> entry, or None for one that so far only exists on disk
+        self._entries: "OrderedDict[str, Optional[Dict[str, Any]]]" = OrderedDict()
+        self._indexed = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _packed(timestamps: Sequence[int], prices: Sequence[float]) -> Tuple[memoryview, memoryview]:
+        """Times and prices as buffers (arrays and memory-mapped columns are not copied)"""
+        stamps = timestamps if isinstance(timestamps, (array, memoryview)) else array('q', timestamps)
+        values = prices if isinstance(prices, array) and prices.typecode == 'd' else array('d', prices)
+        return memoryview(stamps), memoryview(values)
+
+    @staticmethod
+    def _checksum(packed: Tuple[memoryview, memoryview], count: int) -> int:
+        """CRC-32 of the first `count` candles, to tell appended history from a rewrite"""
+        stamps, values = packed
+        return zlib.crc32(values[:count], zlib.crc32(stamps[:count]))
+
+    def _paths(self, key_id: str) -> Tuple[Path, Path]:
+        return self.directory / f"{key_id}.json", self.directory / f"{key_id}.ind"
+
+    def _index_directory(self):
+        """Adopt the newest max_entries entries an earlier run saved and delete the rest"""
+        self._indexed = True
+        try:
+            paths = list(self.directory.iterdir())
+        except OSError:
+            return
+        headers = []
+        for path in paths:
+            if path.suffix == '.json':
+                try:
+                    headers.append((path.stat().st_mtime_ns, path.stem))
+                except OSError:
+                    pass
+        keep = [key_id for _, key_id in sorted(headers)[-self.max_entries:]]
+        kept = set(keep)
+        for path in paths:
+            if path.stem not in kept:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        for key_id in keep:
+            self._entries.setdefault(key_id, None)
+
+    def _remember(self, key_id: str, entry: Dict[str, Any]):
+        """Make entry the most recently used one, evicting (and deleting) the oldest"""
+        self._entries[key_id] = entry
+        self._entries.move_to_end(key_id)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            if self.directory is not None:
+                for path in self._paths(evicted):
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+
+    def _load(self, key_id: str, key: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.directory is not None and not self._indexed:
+            self._index_directory()
+        entry = self._entries.get(key_id)
+        if entry is not None:
+            self._entries.move_to_end(key_id)
+            return entry
+        if self.directory is None:
+            return None
+        header_path, values_path = self._paths(key_id)
+        try:
+            header = json.loads(header_path.read_bytes())
+            columns = header["columns"]
+            settled = header["settled"]
+            values = array('d')
+            with open(values_path, 'rb') as f:
+                # Rows past `settled` are from an update whose header never landed
+                values.frombytes(f.read(settled * len(columns) * values.itemsize))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if header.get("version") != self.VERSION or header.get("key") != key or len(values) != settled * len(columns):
+            return None
+        width = len(columns)
+        header["outputs"] = {
+            column: [None if v != v else v for v in values[i::width]]
+            for i, column in enumerate(columns)
+        }
+        self._remember(key_id, header)
+        return header
+
+    def _save(self, key_id: str, entry: Dict[str, Any], start: int):
+        """Keep an entry in memory and persist it, appending only rows from `start` on"""
+        self._remember(key_id, entry)
+        if self.directory is None:
+            return
+
+        header_path, values_path = self._paths(key_id)
+        header = {k: v for k, v in entry.items() if k != "outputs"}
+        header["version"] = self.VERSION
+        header["columns"] = list(entry["outputs"])
+        if not values_path.exists():
+            start = 0
+        rows = array('d')
+        for row in zip(*(entry["outputs"][column][start:] for column in header["columns"])):
+            rows.extend(math.nan if v is None else v for v in row)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Values first, then the header that makes them count
+        with open(values_path, 'r+b' if start else 'wb') as f:
+            f.seek(start * len(header["columns"]) * rows.itemsize)
+            f.truncate()
+            rows.tofile(f)
+        tmp_path = header_path.with_name(header_path.name + '.tmp')
+        tmp_path.write_bytes(json.dumps(header).encode('utf-8'))
+        os.replace(tmp_path, header_path)
+
+    def get(self, key: Dict[str, Any], timestamps: Sequence[int], prices: Sequence[float],
+            names: Sequence[str], params: Optional[Dict[str, Any]] = None) -> Dict[str, Series]:
+        """
+        Indicator columns for the whole series, reusing cached state where possible.
+
+        Args:
+            key: JSON-serializable description of the source series (pair, interval, ...)
+            timestamps: Candle times, aligned with prices
+            prices: Price series the indicators run on
+            names: Indicators to compute (see INDICATORS)
+            params: Overrides for DEFAULTS
+
+        Returns:
+            Column name -> series with the same values as compute(), as
+            read-only sequences over the cached columns (nothing is copied)
+        """
+        if not prices:
+            return compute(prices, names, params)
+        full_key = {**key, "names": list(names), "params": resolve_params(params)}
+        key_id = hashlib.sha1(json.dumps(full_key, sort_keys=True).encode('utf-8')).hexdigest()[:20]
+        n = len(prices)
+        settled = max(0, n - 1)
+
+        packed = self._packed(timestamps, prices)
+
+        with self._lock:
+            entry = self._load(key_id, full_key)
+            done = entry["settled"] if entry else 0
+            if entry and not (done <= settled and entry["checksum"] == self._checksum(packed, done)):
+                entry = None
+                done = 0
+
+            if entry:
+                stream = IndicatorStream.from_dict(entry["stream"])
+                outputs = entry["outputs"]
+            else:
+                stream = IndicatorStream(names, params)
+                outputs = {}
+
+            for i in range(done, settled):
+                for column, value in stream.update(prices[i]).items():
+                    outputs.setdefault(column, []).append(value)
+
+            if entry is None or settled > done:
+                self._save(key_id, {
+                    "key": full_key,
+                    "settled": settled,
+                    "checksum": self._checksum(packed, settled),
+                    "stream": stream.to_dict(),
+                    "outputs": outputs,
+                }, done)
+
+            # The newest candle goes through a throwaway copy of the state
+            tail = IndicatorStream.from_dict(stream.to_dict()).update(prices[n - 1])
+            return {column: _Appended(outputs.get(column, []), value) for column, value in tail.items()}
+
+
+def _naive_bollinger_bands(prices: Sequence[float], period: int = 20, std_dev: float = 2.0) -> Dict[str, Series]:
+    """
+    Per-window loop of calculateBollingerBands, kept as the benchmark baseline.
+    """
+    result: Dict[str, Series] = {"upper": [], "middle": [], "lower": []}
+    for i in range(len(prices)):
+        if i < period - 1:
+            result["upper"].append(None)
+            result["middle"].append(None)
+            result["lower"].append(None)
+            continue
+        window = prices[i - period + 1:i + 1]
+        sma = sum(window) / period
+        std = math.sqrt(sum((x - sma) ** 2 for x in window) / period)
+        result["middle"].append(sma)
+        result["upper"].append(sma + std_dev * std)
+        result["lower"].append(sma - std_dev * std)
+    return result
+
+
+def _max_relative_error(a: Series, b: Series) -> float:
+    """Largest relative difference between two series (inf if their None positions differ)"""
+    worst = 0.0
+    for x, y in zip(a, b):
+        if x is None or y is None:
+            if x is not y:
+                return math.inf
+            continue
+        worst = max(worst, abs(x - y) / max(abs(x), abs(y), 1e-12))
+    return worst
+
+
+def run_benchmark(pairs: Sequence[str], repeat: int = 20) -> None:
+    """
+    Compare the per-window Bollinger loop with the rolling version on the bundled CSVs.
+
+    Reports the best of `repeat` alternating runs per pair and checks both
+    give the same bands.
+    """
+    from mcp_candles import CandleCache
+
+    cache = CandleCache(Path(__file__).parent / "database", max_pairs=1)
+    pairs = [p.upper() for p in pairs] or cache.pairs()
+    print(f"Bollinger bands ({DEFAULTS['bb_period']}, {DEFAULTS['bb_std_dev']}), best of {repeat} runs\n")
+
+    totals = {"naive": 0.0, "rolling": 0.0}
+    for pair in pairs:
+        prices = price_series(cache.get(pair).columns)
+        variants = (("naive", _naive_bollinger_bands), ("rolling", bollinger_bands))
+        best = {name: math.inf for name, _ in variants}
+        outputs = {}
+        # Alternate the variants so background noise hits both alike
+        for _ in range(repeat):
+            for name, func in variants:
+                start = time.perf_counter()
+                outputs[name] = func(prices)
+                best[name] = min(best[name], time.perf_counter() - start)
+        error = max(_max_relative_error(outputs["naive"][band], outputs["rolling"][band])
+                    for band in ("upper", "middle", "lower"))
+        for name in totals:
+            totals[name] += best[name]
+        print(f"  {pair:<8} {len(prices):>6} candles  naive {best['naive'] * 1000:8.2f} ms  "
+              f"rolling {best['rolling'] * 1000:7.2f} ms  {best['naive'] / best['rolling']:5.1f}x  "
+              f"max rel. error {error:.1e}")
+
+    print(f"\n  Total: naive {totals['naive'] * 1000:.2f} ms, rolling {totals['rolling'] * 1000:.2f} ms "
+          f"-> {totals['naive'] / totals['rolling']:.1f}x")
+
+
+def main():
+    """Command line entry point (benchmark only)"""
+    parser = argparse.ArgumentParser(description="Technical indicators for the candle CSVs")
+    parser.add_argument('--benchmark', nargs='*', metavar='PAIR',
+                        help="Benchmark Bollinger bands against the per-window loop "
+                             "(default: every bundled pair)")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per variant (default 20)")
+    args = parser.parse_args()
+    if args.benchmark is None:
+        parser.print_help()
+        return
+    run_benchmark(args.benchmark, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
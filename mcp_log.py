@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Shared log sink for the MCP servers
+
+Log lines are queued by the caller and written by a background thread,
+which batches them to stderr and to a size-rotated debug file.
+"""
+
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+DEBUG = 10
+INFO = 20
+ERROR = 40
+
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "ERROR": ERROR}
+
+# Message may be a string or a callable producing it (only evaluated when enabled)
+Message = Union[str, Callable[[], str]]
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment"""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment"""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class LogSink:
+    """Buffered, queue-based log writer with size rotation"""
+
+    def __init__(
+        self,
+        path: Path,
+        tag: str,
+        level: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        backup_count: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        flush_lines: Optional[int] = None,
+        echo_stderr: bool = True,
+    ):
+        self.path = Path(path)
+        self.tag = tag
+        if level is None:
+            level = LEVELS.get(os.environ.get("MCP_LOG_LEVEL", "INFO").upper(), INFO)
+        self.level = level
+        self.max_bytes = max_bytes if max_bytes is not None else _env_int("MCP_LOG_MAX_BYTES", 10 * 1024 * 1024)
+        self.backup_count = backup_count if backup_count is not None else _env_int("MCP_LOG_BACKUPS", 3)
+        self.flush_interval = flush_interval if flush_interval is not None else _env_float("MCP_LOG_FLUSH_INTERVAL", 0.2)
+        self.flush_lines = flush_lines if flush_lines is not None else _env_int("MCP_LOG_FLUSH_LINES", 256)
+        self.echo_stderr = echo_stderr
+
+        self._queue: "queue.SimpleQueue[Optional[Tuple[float, str]]]" = queue.SimpleQueue()
+        self._file = None
+        self._size = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"log-{tag}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def enabled(self, level: int) -> bool:
+        """Return True if messages at this level are recorded"""
+        return level >= self.level
+
+    def log(self, message: Message, level: int = INFO):
+        """Queue a message; callables are only evaluated when enabled"""
+        if level < self.level or self._closed:
+            return
+        if callable(message):
+            message = message()
+        self._queue.put((time.time(), message))
+
+    def debug(self, message: Message):
+        self.log(message, DEBUG)
+
+    def info(self, message: Message):
+        self.log(message, INFO)
+
+    def error(self, message: Message):
+        self.log(message, ERROR)
+
+    def close(self):
+        """Flush pending lines and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _format(self, record: Tuple[float, str]) -> str:
+        created, message = record
+        timestamp = datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S.%f")
+        return f"[{timestamp}] [{self.tag}] {message}\n"
+
+    def _open(self):
+        try:
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._size = self._file.tell()
+        except OSError:
+            self._file = None
+
+    def _rotate(self):
+        """Shift server_debug.log -> .1 -> .2 ... keeping backup_count files"""
+        if self._file:
+            self._file.close()
+            self._file = None
+        try:
+            if self.backup_count > 0:
+                for i in range(self.backup_count - 1, 0, -1):
+                    src = self.path.with_name(f"{self.path.name}.{i}")
+                    if src.exists():
+                        os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+                os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+            else:
+                self.path.unlink()
+        except OSError:
+            pass
+        self._open()
+
+    def _write(self, lines: List[str]):
+        data = "".join(lines)
+
+        if self.echo_stderr:
+            try:
+                sys.stderr.write(data)
+                sys.stderr.flush()
+            except Exception:
+                pass
+
+        if self._file is None:
+            self._open()
+        if self._file is None:
+            return
+        try:
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data.encode('utf-8'))
+            if self.max_bytes > 0 and self._size >= self.max_bytes:
+                self._rotate()
+        except OSError:
+            pass
+
+    def _run(self):
+        pending: List[str] = []
+        deadline = None
+        running = True
+
+        while running:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = ()
+
+            if record is None:
+                running = False
+            elif record:
+                pending.append(self._format(record))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if pending and (
+                not running
+                or len(pending) >= self.flush_lines
+                or time.monotonic() >= deadline
+            ):
+                self._write(pending)
+                pending = []
+                deadline = None
+
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -7,45 +7,98 @@ Corrected to properly handle MCP protocol
 import json
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Union
+
+from database.candle_store import format_timestamp
+from mcp_backtest import DEFAULT_PARAMS as BACKTEST_DEFAULTS, backtest, shutdown as shutdown_backtests, sweep
+from mcp_candles import CANDLE_FIELDS, INTERVALS, CandleCache, index_range, parse_time, resample
+from mcp_files import DEFAULT_READ_LENGTH, ChunkedUploads, DirectoryIndex, read_range, write_text_file
+from mcp_indicators import DEFAULTS as INDICATOR_DEFAULTS, INDICATORS, PRICE_SOURCES, IndicatorCache, price_series
+from mcp_framing import FrameReader, FrameWriter
+from mcp_log import LogSink, Message
 
 # CRITICAL: Redirect all logs to a file for debugging
 LOG_FILE = Path(__file__).parent / "server_debug.log"
 
-def log(message: str):
-    """Log to both stderr and file"""
-    timestamp = __import__('datetime').datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-    log_msg = f"[{timestamp}] [SERVER] {message}\n"
-    
-    # Write to stderr
-    sys.stderr.write(log_msg)
-    sys.stderr.flush()
-    
-    # Write to debug file
-    try:
-        with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(log_msg)
-    except:
-        pass
-
-# Log startup
-log("=" * 60)
-log("SERVER STARTING - FIXED VERSION")
-log(f"Python version: {sys.version}")
-log(f"Platform: {sys.platform}")
-log(f"Script: {__file__}")
-log(f"CWD: {os.getcwd()}")
-
 # Working directory
 WORKING_DIR = Path(__file__).parent / "mcp_sandbox"
-log(f"Working directory: {WORKING_DIR}")
 
+# Candle CSVs served by the market data tools
+CANDLES_DIR = Path(__file__).parent / "database"
+
+# Pairs kept in memory at once (least recently used are evicted)
+try:
+    CANDLE_CACHE_PAIRS = max(1, int(os.environ.get("MCP_CANDLE_CACHE_PAIRS", "4")))
+except ValueError:
+    CANDLE_CACHE_PAIRS = 4
+
+# Max in-flight tools/call requests (1 = handle messages strictly in order)
 try:
-    WORKING_DIR.mkdir(parents=True, exist_ok=True)
-    log(f"✓ Sandbox created: {WORKING_DIR.resolve()}")
-except Exception as e:
-    log(f"✗ Error creating sandbox: {e}")
+    MAX_CONCURRENCY = max(1, int(os.environ.get("MCP_CONCURRENCY", "1")))
+except ValueError:
+    MAX_CONCURRENCY = 1
+
+# Everything below is created by setup(), so importing this module has no side
+# effects: backtest sweep workers re-import the main script as __mp_main__
+_log_sink: Optional[LogSink] = None
+
+# Chunked write_file uploads are staged here, then renamed into place
+UPLOADS: Optional[ChunkedUploads] = None
+
+# Cached listing of the sandbox, kept current by write_file
+FILE_INDEX: Optional[DirectoryIndex] = None
+
+CANDLES: Optional[CandleCache] = None
+
+# Indicator state saved between requests (and restarts) so new candles are O(1) each
+INDICATOR_CACHE: Optional[IndicatorCache] = None
+
+# Binary stdio: requests may be NDJSON or Content-Length framed, replies are NDJSON;
+# the writer serializes stdout so each response is written as one unbroken message
+_frames_in: Optional[FrameReader] = None
+_frames_out: Optional[FrameWriter] = None
+
+def log(message: Message):
+    """Log to both stderr and file (written by a background thread)"""
+    _log_sink.info(message)
+
+def debug(message: Message):
+    """Log only when MCP_LOG_LEVEL=DEBUG; pass a lambda to defer formatting"""
+    _log_sink.debug(message)
+
+def setup():
+    """Start logging, create the sandbox and the caches, and attach to stdio"""
+    global _log_sink, UPLOADS, FILE_INDEX, CANDLES, INDICATOR_CACHE, _frames_in, _frames_out
+    _log_sink = LogSink(LOG_FILE, "SERVER")
+    
+    # Log startup
+    log("=" * 60)
+    log("SERVER STARTING - FIXED VERSION")
+    log(f"Python version: {sys.version}")
+    log(f"Platform: {sys.platform}")
+    log(f"Script: {__file__}")
+    log(f"CWD: {os.getcwd()}")
+    log(f"Working directory: {WORKING_DIR}")
+    
+    try:
+        WORKING_DIR.mkdir(parents=True, exist_ok=True)
+        log(f"✓ Sandbox created: {WORKING_DIR.resolve()}")
+    except Exception as e:
+        log(f"✗ Error creating sandbox: {e}")
+    
+    UPLOADS = ChunkedUploads(WORKING_DIR / ".uploads")
+    FILE_INDEX = DirectoryIndex(WORKING_DIR)
+    CANDLES = CandleCache(CANDLES_DIR, max_pairs=CANDLE_CACHE_PAIRS)
+    INDICATOR_CACHE = IndicatorCache(Path(__file__).parent / ".indicator_cache")
+    log(f"Max concurrency: {MAX_CONCURRENCY}")
+    
+    _frames_in = FrameReader(sys.stdin.buffer)
+    _frames_out = FrameWriter(sys.stdout.buffer)
 
 # Tool definitions
 TOOLS = [
@@ -56,7 +109,13 @@ TOOLS = [
             "type": "object",
             "properties": {
                 "filename": {"type": "string", "description": "Name of the file to write"},
-                "content": {"type": "string", "description": "Content to write to the file"}
+                "content": {"type": "string", "description": "Content to write to the file"},
+                "append": {"type": "boolean", "description": "Append to the file instead of overwriting it"},
+                "upload_id": {"type": "string", "description": "Chunked upload: id shared by all chunks of one file"},
+                "chunk_index": {"type": "integer", "description": "Chunked upload: 0-based chunk number, sent in order"},
+                "final": {"type": "boolean", "description": "Chunked upload: last chunk, atomically replaces the file"},
+                "abort": {"type": "boolean", "description": "Chunked upload: discard the chunks received so far"},
+                "fsync": {"type": "boolean", "description": "fsync the data to disk before replying"}
             },
             "required": ["filename", "content"]
         }
@@ -67,7 +126,9 @@ TOOLS = [
         "inputSchema": {
             "type": "object",
             "properties": {
-                "filename": {"type": "string", "description": "Name of the file to read"}
+                "filename": {"type": "string", "description": "Name of the file to read"},
+                "offset": {"type": "integer", "description": "Byte offset to start reading from (enables ranged read)"},
+                "length": {"type": "integer", "description": f"Max bytes to read in a ranged read (default {DEFAULT_READ_LENGTH})"}
             },
             "required": ["filename"]
         }
@@ -77,7 +138,100 @@ TOOLS = [
         "description": f"List all files in {WORKING_DIR.resolve()}",
         "inputSchema": {
             "type": "object",
-            "properties": {}
+            "properties": {
+                "pattern": {"type": "string", "description": "Glob filter on file names (e.g. '*.csv')"},
+                "cursor": {"type": "string", "description": "Continue after this name (from the previous page)"},
+                "limit": {"type": "integer", "description": "Max files to return"},
+                "details": {"type": "boolean", "description": "Include size and modification time"}
+            }
+        }
+    },
+    {
+        "name": "query_candles",
+        "description": f"Query 15-minute candles for a pair from {CANDLES_DIR.resolve()}",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "pair": {"type": "string", "description": "Pair code, e.g. 'BTCBRL'"},
+                "start": {"type": "string", "description": "First candle time (ISO 8601 or epoch seconds, UTC if no offset)"},
+                "end": {"type": "string", "description": "Last candle time (a bare date includes the whole day)"},
+                "fields": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": list(CANDLE_FIELDS)},
+                    "description": "Columns to return (default all)"
+                },
+                "limit": {"type": "integer", "description": "Max candles to return"}
+            },
+            "required": ["pair"]
+        }
+    },
+    {
+        "name": "aggregate_candles",
+        "description": "Resample a pair's 15-minute candles to 1h/4h/1d (open first, high max, low min, close last, volume sum)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "pair": {"type": "string", "description": "Pair code, e.g. 'BTCBRL'"},
+                "interval": {"type": "string", "enum": list(INTERVALS), "description": "Bucket size (default 1h)"},
+                "utc_offset": {"type": "number", "description": "Hours added to UTC to align buckets, e.g. -3 for São Paulo days (default 0)"},
+                "start": {"type": "string", "description": "First bucket start (ISO 8601 or epoch seconds, UTC if no offset)"},
+                "end": {"type": "string", "description": "Last bucket start (a bare date includes the whole day)"},
+                "fields": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": list(CANDLE_FIELDS)},
+                    "description": "Columns to return (default all)"
+                },
+                "limit": {"type": "integer", "description": "Max buckets to return"}
+            },
+            "required": ["pair"]
+        }
+    },
+    {
+        "name": "indicators",
+        "description": "Compute EMA, Bollinger bands, RSI and MACD for a pair (same formulas as site/crypto_functions.php)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "pair": {"type": "string", "description": "Pair code, e.g. 'BTCBRL'"},
+                "indicators": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": list(INDICATORS)},
+                    "description": "Indicators to compute (default all)"
+                },
+                "interval": {"type": "string", "enum": ["15m"] + list(INTERVALS), "description": "Candle size (default 15m)"},
+                "utc_offset": {"type": "number", "description": "Hours added to UTC to align resampled buckets (default 0)"},
+                "price": {"type": "string", "enum": list(PRICE_SOURCES), "description": "Price series: mid = (open + close) / 2 as on the site (default)"},
+                "start": {"type": "string", "description": "First row to return (ISO 8601 or epoch seconds, UTC if no offset)"},
+                "end": {"type": "string", "description": "Last row to return (a bare date includes the whole day)"},
+                "limit": {"type": "integer", "description": "Max rows to return"},
+                **{key: {"type": "number", "description": f"Default {value}"} for key, value in INDICATOR_DEFAULTS.items()}
+            },
+            "required": ["pair"]
+        }
+    },
+    {
+        "name": "backtest",
+        "description": "Backtest the site/crypto_strategy.php Bollinger/RSI strategy on one or more pairs, optionally sweeping a parameter grid",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "pairs": {"type": "array", "items": {"type": "string"}, "description": "Pair codes, e.g. ['BTCBRL', 'SOLBRL']"},
+                "interval": {"type": "string", "enum": ["15m"] + list(INTERVALS), "description": "Candle size (default 1h, as the site)"},
+                "utc_offset": {"type": "number", "description": "Hours added to UTC to align resampled buckets (default 0)"},
+                "price": {"type": "string", "enum": list(PRICE_SOURCES), "description": "Price series (default mid = (open + close) / 2)"},
+                "start": {"type": "string", "description": "First candle to trade on (ISO 8601 or epoch seconds)"},
+                "end": {"type": "string", "description": "Last candle to trade on (a bare date includes the whole day)"},
+                "params": {
+                    "type": "object",
+                    "description": "Strategy parameter overrides: " + ", ".join(f"{k} ({v})" for k, v in BACKTEST_DEFAULTS.items())
+                },
+                "grid": {
+                    "type": "object",
+                    "description": "Parameter sweep: {name: [values, ...]}; every combination is run on every pair"
+                },
+                "top": {"type": "integer", "description": "Sweep results to return, best return first (default 10)"}
+            },
+            "required": ["pairs"]
         }
     }
 ]
@@ -85,7 +239,7 @@ TOOLS = [
 def handle_initialize(params: Dict[str, Any]) -> Dict[str, Any]:
     """Handle initialize request"""
     log("INITIALIZE called")
-    log(f"  Params: {json.dumps(params)}")
+    debug(lambda: f"  Params: {json.dumps(params)}")
     
     result = {
         "protocolVersion": "2024-11-05",
@@ -98,7 +252,7 @@ def handle_initialize(params: Dict[str, Any]) -> Dict[str, Any]:
         }
     }
     
-    log(f"  Result: {json.dumps(result)}")
+    debug(lambda: f"  Result: {json.dumps(result)}")
     return result
 
 def handle_list_tools() -> Dict[str, Any]:
@@ -122,10 +276,58 @@ def handle_list_resources() -> Dict[str, Any]:
     log("  Returning empty resources list")
     return result
 
+def name_list(value: Any) -> List[str]:
+    """Accept a list of names or a comma-separated string"""
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return list(value or [])
+
+def candle_table(columns: Dict[str, Any], arguments: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Render the start/end/limit slice of candle columns as a CSV tool result"""
+    if fields is None:
+        fields = name_list(arguments.get("fields")) or list(CANDLE_FIELDS)
+        unknown = [f for f in fields if f not in CANDLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    
+    timestamps = columns["timestamp"]
+    lo, hi = index_range(
+        timestamps,
+        parse_time(arguments.get("start")),
+        parse_time(arguments.get("end"), end=True)
+    )
+    total = hi - lo
+    limit = arguments.get("limit")
+    if limit is not None:
+        hi = min(hi, lo + max(0, int(limit)))
+    
+    lines = [",".join(["timestamp"] + fields)]
+    lines.extend(
+        # Round to the DECIMAL(20, 8) precision of the source data to hide float sum noise
+        ",".join([format_timestamp(ts)] + ["" if v is None else repr(round(v, 8)) for v in values])
+        for ts, *values in zip(timestamps[lo:hi], *(columns[f][lo:hi] for f in fields))
+    )
+    msg = "\n".join(lines)
+    if hi - lo < total:
+        msg += f"\n\n[{hi - lo} of {total} rows; narrow the range or raise limit for more]"
+    return {
+        "content": [{"type": "text", "text": msg}],
+        "_meta": {"count": hi - lo, "total": total}
+    }
+
+def interval_columns(series: Any, interval: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """A series' 15m columns or its resampled rollup (aligned by the utc_offset argument)"""
+    if interval == "15m":
+        return series.columns
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of 15m, {', '.join(INTERVALS)}")
+    offset = int(round(float(arguments.get("utc_offset") or 0) * 3600))
+    return resample(series, INTERVALS[interval], offset)
+
 def handle_call_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
     """Handle tools/call request"""
     log(f"TOOLS/CALL: {name}")
-    log(f"  Args: {json.dumps(arguments)}")
+    debug(lambda: f"  Args: {json.dumps(arguments)}")
     
     try:
         if name == "write_file":
@@ -140,8 +342,44 @@ def handle_call_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
             if not filepath.resolve().is_relative_to(WORKING_DIR.resolve()):
                 return {"content": [{"type": "text", "text": "Error: Invalid filename"}]}
             
-            filepath.write_text(content, encoding='utf-8')
-            msg = f"✓ Wrote to {filepath.resolve()}\n({len(content)} characters)"
+            upload_id = arguments.get("upload_id")
+            fsync = bool(arguments.get("fsync", False))
+            
+            if upload_id and arguments.get("abort"):
+                if not UPLOADS.abort(str(upload_id)):
+                    return {"content": [{"type": "text", "text": f"Error: Unknown upload '{upload_id}'"}]}
+                msg = f"✓ Upload '{upload_id}' aborted"
+                log(f"  Success: {msg}")
+                return {"content": [{"type": "text", "text": msg}]}
+            
+            if upload_id:
+                final = bool(arguments.get("final", False))
+                # Only the final chunk creates the target file
+                with FILE_INDEX.tracking(filepath) if final else nullcontext():
+                    status = UPLOADS.write_chunk(
+                        str(upload_id),
+                        filepath,
+                        int(arguments.get("chunk_index", 0)),
+                        content,
+                        final=final,
+                        fsync=fsync
+                    )
+                if status["complete"]:
+                    msg = (f"✓ Wrote to {filepath.resolve()}\n"
+                           f"({status['characters']} characters in {status['chunks']} chunks)")
+                elif status["duplicate"]:
+                    msg = f"✓ Chunk already received for upload '{upload_id}' ({status['chunks']} chunks so far)"
+                else:
+                    msg = (f"✓ Received chunk {status['chunks'] - 1} for upload '{upload_id}'\n"
+                           f"({status['characters']} characters so far)")
+                log(f"  Success: {msg}")
+                return {"content": [{"type": "text", "text": msg}], "_meta": {"upload": status}}
+            
+            append = bool(arguments.get("append", False))
+            with FILE_INDEX.tracking(filepath):
+                written = write_text_file(filepath, content, append=append, fsync=fsync)
+            action = "Appended to" if append else "Wrote to"
+            msg = f"✓ {action} {filepath.resolve()}\n({written} characters)"
             log(f"  Success: {msg}")
             return {"content": [{"type": "text", "text": msg}]}
         
@@ -159,18 +397,169 @@ def handle_call_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
             if not filepath.exists():
                 return {"content": [{"type": "text", "text": f"Error: File '{filename}' not found"}]}
             
-            content = filepath.read_text(encoding='utf-8')
-            log(f"  Read {len(content)} characters")
-            return {"content": [{"type": "text", "text": content}]}
+            offset = arguments.get("offset")
+            length = arguments.get("length")
+            
+            if offset is None and length is None:
+                content = filepath.read_text(encoding='utf-8')
+                log(f"  Read {len(content)} characters")
+                return {"content": [{"type": "text", "text": content}]}
+            
+            # Ranged read: only the requested slice is read from disk
+            content, cursor = read_range(
+                filepath,
+                int(offset or 0),
+                DEFAULT_READ_LENGTH if length is None else int(length)
+            )
+            log(f"  Read bytes {cursor['offset']}-{cursor['next_offset']} of {cursor['size']}")
+            if cursor["eof"]:
+                status = f"[bytes {cursor['offset']}-{cursor['next_offset']} of {cursor['size']}, end of file]"
+            else:
+                status = f"[bytes {cursor['offset']}-{cursor['next_offset']} of {cursor['size']}, continue with offset={cursor['next_offset']}]"
+            return {
+                "content": [
+                    {"type": "text", "text": content},
+                    {"type": "text", "text": status}
+                ],
+                "_meta": {"cursor": cursor}
+            }
         
         elif name == "list_files":
-            files = [f.name for f in WORKING_DIR.iterdir() if f.is_file()]
+            pattern = arguments.get("pattern")
+            details = bool(arguments.get("details", False))
+            limit = arguments.get("limit")
+            files, next_cursor = FILE_INDEX.list(
+                pattern=pattern,
+                cursor=arguments.get("cursor"),
+                limit=int(limit) if limit is not None else None,
+                details=details
+            )
+            
             if files:
-                file_list = "\n".join(f"  • {f}" for f in sorted(files))
+                lines = []
+                for f in files:
+                    line = f"  • {f['name']}"
+                    if details and "size" in f:
+                        modified = datetime.fromtimestamp(f["mtime"]).strftime("%Y-%m-%d %H:%M:%S")
+                        line += f" ({f['size']} bytes, modified {modified})"
+                    lines.append(line)
+                file_list = "\n".join(lines)
                 msg = f"Files in {WORKING_DIR.resolve()}:\n{file_list}"
+                if next_cursor:
+                    msg += f"\n\n[more files: continue with cursor={next_cursor!r}]"
+            elif pattern or arguments.get("cursor"):
+                msg = f"No matching files in {WORKING_DIR.resolve()}"
             else:
                 msg = f"No files in {WORKING_DIR.resolve()} yet"
-            return {"content": [{"type": "text", "text": msg}]}
+            return {
+                "content": [{"type": "text", "text": msg}],
+                "_meta": {"files": files, "next_cursor": next_cursor}
+            }
+        
+        elif name == "query_candles":
+            pair = arguments.get("pair")
+            
+            if not pair:
+                return {"content": [{"type": "text", "text": "Error: pair is required"}]}
+            
+            series = CANDLES.get(pair)
+            result = candle_table(series.columns, arguments)
+            result["_meta"]["pair"] = series.pair
+            log(f"  {series.pair}: {result['_meta']['count']} of {result['_meta']['total']} candles")
+            return result
+        
+        elif name == "aggregate_candles":
+            pair = arguments.get("pair")
+            interval = arguments.get("interval") or "1h"
+            
+            if not pair:
+                return {"content": [{"type": "text", "text": "Error: pair is required"}]}
+            if interval not in INTERVALS:
+                return {"content": [{"type": "text", "text": f"Error: interval must be one of {', '.join(INTERVALS)}"}]}
+            
+            series = CANDLES.get(pair)
+            offset = int(round(float(arguments.get("utc_offset") or 0) * 3600))
+            result = candle_table(resample(series, INTERVALS[interval], offset), arguments)
+            result["_meta"].update({"pair": series.pair, "interval": interval})
+            log(f"  {series.pair} {interval}: {result['_meta']['count']} of {result['_meta']['total']} buckets")
+            return result
+        
+        elif name == "indicators":
+            pair = arguments.get("pair")
+            interval = arguments.get("interval") or "15m"
+            
+            if not pair:
+                return {"content": [{"type": "text", "text": "Error: pair is required"}]}
+            
+            series = CANDLES.get(pair)
+            columns = interval_columns(series, interval, arguments)
+            offset = int(round(float(arguments.get("utc_offset") or 0) * 3600))
+            
+            # Computed over the whole history so the warm-up precedes the requested range
+            price = arguments.get("price") or "mid"
+            prices = price_series(columns, price)
+            names = name_list(arguments.get("indicators")) or list(INDICATORS)
+            values = INDICATOR_CACHE.get(
+                {"pair": series.pair, "interval": interval, "offset": offset, "price": price},
+                columns["timestamp"],
+                prices,
+                names,
+                {key: arguments.get(key) for key in INDICATOR_DEFAULTS}
+            )
+            
+            table = {"timestamp": columns["timestamp"], "price": prices, **values}
+            result = candle_table(table, arguments, ["price"] + list(values))
+            result["_meta"].update({"pair": series.pair, "interval": interval, "indicators": names})
+            log(f"  {series.pair} {interval} {','.join(names)}: {result['_meta']['count']} rows")
+            return result
+        
+        elif name == "backtest":
+            pairs = name_list(arguments.get("pairs") or arguments.get("pair"))
+            interval = arguments.get("interval") or "1h"
+            price = arguments.get("price") or "mid"
+            
+            if not pairs:
+                return {"content": [{"type": "text", "text": "Error: pairs is required"}]}
+            
+            start = parse_time(arguments.get("start"))
+            end = parse_time(arguments.get("end"), end=True)
+            prices_by_pair = {}
+            timestamps_by_pair = {}
+            for pair in pairs:
+                series = CANDLES.get(pair)
+                columns = interval_columns(series, interval, arguments)
+                lo, hi = index_range(columns["timestamp"], start, end)
+                prices_by_pair[series.pair] = price_series({k: v[lo:hi] for k, v in columns.items()}, price)
+                timestamps_by_pair[series.pair] = columns["timestamp"][lo:hi]
+            
+            params = arguments.get("params") or {}
+            grid = arguments.get("grid")
+            
+            if grid:
+                result = sweep(prices_by_pair, params, grid, top=int(arguments.get("top") or 10))
+                lines = [f"Swept {result['combos']} runs in {result['seconds']:.2f}s ({interval}, {price} price), best first:"]
+                for r in result["best"]:
+                    lines.append(
+                        f"  {r['pair']:<8} {r['return_pct']:+8.2f}%  max drawdown {r['max_drawdown_pct']:6.2f}%  "
+                        f"{r['trade_count']:>3} trades  {json.dumps(r['params'], sort_keys=True)}"
+                    )
+                log(f"  Sweep: {result['combos']} runs in {result['seconds']:.2f}s")
+                return {"content": [{"type": "text", "text": "\n".join(lines)}], "_meta": result}
+            
+            results = {}
+            lines = [f"Backtest ({interval}, {price} price):"]
+            for pair, prices in prices_by_pair.items():
+                r = backtest(prices, params, timestamps_by_pair[pair])
+                for trade in r["trades"]:
+                    trade["timestamp"] = format_timestamp(trade["timestamp"])
+                results[pair] = r
+                hold = "n/a" if r["buy_hold_pct"] is None else f"{r['buy_hold_pct']:+.2f}%"
+                lines.append(
+                    f"  {pair:<8} {len(prices):>5} candles  P&L {r['pnl']:+.2f} ({r['return_pct']:+.2f}%, buy & hold {hold})  "
+                    f"max drawdown {r['max_drawdown_pct']:.2f}%  {r['trade_count']} trades"
+                )
+            log(f"  Backtest: {', '.join(results)}")
+            return {"content": [{"type": "text", "text": "\n".join(lines)}], "_meta": {"results": results}}
         
         else:
             return {"content": [{"type": "text", "text": f"Unknown tool: {name}"}]}
@@ -181,7 +570,7 @@ def handle_call_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         traceback.print_exc(file=sys.stderr)
         return {"content": [{"type": "text", "text": f"Error: {str(e)}"}]}
 
-def process_request(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def process_single(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Process a JSON-RPC request"""
     method = request.get("method")
     params = request.get("params", {})
@@ -241,83 +630,154 @@ def process_request(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
             }
         }
 
-def send_message(message: Dict[str, Any]):
+def describe_message(message: Any) -> str:
+    """Short summary of a message or batch for the log"""
+    if isinstance(message, list):
+        ids = [m.get("id") for m in message if isinstance(m, dict)]
+        return f"batch of {len(message)}, ids={ids}"
+    if isinstance(message, dict):
+        return f"method={message.get('method')}, id={message.get('id')}"
+    return f"invalid message: {type(message).__name__}"
+
+def invalid_request(request_id: Any = None) -> Dict[str, Any]:
+    """Build the JSON-RPC error for a message that is not a request object"""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {
+            "code": -32600,
+            "message": "Invalid Request"
+        }
+    }
+
+_batch_executor: Optional[ThreadPoolExecutor] = None
+
+def process_batch(requests: List[Any]) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Process a JSON-RPC batch, in parallel when MCP_CONCURRENCY > 1"""
+    global _batch_executor
+    log(f"BATCH: {len(requests)} requests")
+    
+    if not requests:
+        # Per JSON-RPC 2.0 an empty batch gets a single (non-array) error
+        return invalid_request()
+    
+    if MAX_CONCURRENCY > 1 and len(requests) > 1:
+        # Separate pool from main()'s so batch items never wait on a busy caller
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="batch")
+        responses = list(_batch_executor.map(process_batch_item, requests))
+    else:
+        responses = [process_batch_item(r) for r in requests]
+    
+    # Notifications produce no entry; an all-notification batch gets no reply
+    responses = [r for r in responses if r]
+    return responses or None
+
+def process_batch_item(request: Any) -> Optional[Dict[str, Any]]:
+    """Process one batch entry (nested batches are invalid)"""
+    if not isinstance(request, dict):
+        return invalid_request()
+    return process_single(request)
+
+def process_request(request: Any) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Process a JSON-RPC request object or batch array"""
+    if isinstance(request, list):
+        return process_batch(request)
+    if not isinstance(request, dict):
+        return invalid_request()
+    return process_single(request)
+
+def parse_error() -> Dict[str, Any]:
+    """Build the JSON-RPC error for a message that could not be parsed"""
+    return {
+        "jsonrpc": "2.0",
+        "id": None,
+        "error": {
+            "code": -32700,
+            "message": "Parse error"
+        }
+    }
+
+def send_message(message: Union[Dict[str, Any], List[Dict[str, Any]]]):
     """Send a JSON-RPC message"""
     try:
-        json_str = json.dumps(message)
-        
-        # Try newline-delimited JSON format first (simpler)
-        sys.stdout.write(json_str + '\n')
-        sys.stdout.flush()
-        
-        log(f"SENT response id={message.get('id')}")
+        _frames_out.write_message(message)
+        log(f"SENT response {describe_message(message)}")
     except Exception as e:
         log(f"ERROR sending message: {e}")
         import traceback
         traceback.print_exc(file=sys.stderr)
 
-def read_message() -> Optional[Dict[str, Any]]:
-    """Read a JSON-RPC message from stdin"""
-    try:
-        # Read first line
-        first_line = sys.stdin.readline().strip()
-        if not first_line:
-            log("No input (EOF)")
+def read_message() -> Optional[Any]:
+    """Read a JSON-RPC message (object or batch array) from stdin, NDJSON or Content-Length framed"""
+    while True:
+        try:
+            message = _frames_in.read_message()
+        except ValueError as e:
+            # The bad frame has been skipped: report it and keep reading
+            log(f"ERROR parsing message: {e}")
+            send_message(parse_error())
+            continue
+        except Exception as e:
+            log(f"ERROR reading message: {e}")
+            import traceback
+            traceback.print_exc(file=sys.stderr)
             return None
         
-        log(f"READ first line: {first_line[:100]}...")
-        
-        # Check if it's Content-Length format or direct JSON
-        if "Content-Length:" in first_line:
-            # Standard MCP format with Content-Length header
-            content_length = int(first_line.split(":", 1)[1].strip())
-            log(f"Content-Length format: {content_length} bytes")
-            
-            # Read empty line
-            sys.stdin.readline()
-            
-            # Read content
-            content = sys.stdin.read(content_length)
-            if not content:
-                log("No content")
-                return None
-            
-            message = json.loads(content)
-        else:
-            # Direct JSON format (Claude Desktop seems to use this)
-            log("Direct JSON format")
-            message = json.loads(first_line)
+        if message is None:
+            log("No input (EOF)")
+            return None
         
-        log(f"RECEIVED: method={message.get('method')}, id={message.get('id')}")
+        debug(lambda: f"READ {_frames_in.last_framing} message")
+        log(f"RECEIVED: {describe_message(message)}")
         return message
+
+def dispatch(message: Dict[str, Any]):
+    """Process one message and send its response, if any"""
+    response = process_request(message)
     
-    except Exception as e:
-        log(f"ERROR reading message: {e}")
-        import traceback
-        traceback.print_exc(file=sys.stderr)
-        return None
+    if response:
+        send_message(response)
+    else:
+        log("No response to send (notification)")
 
 def main():
     """Main entry point"""
+    setup()
     log("MAIN LOOP starting")
     
+    # tools/call requests run on a worker pool and reply (tagged with their id)
+    # as soon as they finish; the semaphore stops reading once the limit is hit
+    executor = None
+    slots = None
+    if MAX_CONCURRENCY > 1:
+        executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="tool")
+        slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+    
+    def run_in_slot(message: Dict[str, Any]):
+        try:
+            dispatch(message)
+        except Exception as e:
+            log(f"ERROR in worker: {e}")
+        finally:
+            slots.release()
+    
     try:
         iteration = 0
         while True:
             iteration += 1
-            log(f"--- Iteration {iteration} ---")
+            debug(f"--- Iteration {iteration} ---")
             
             message = read_message()
             if message is None:
                 log("No message, exiting")
                 break
             
-            response = process_request(message)
-            
-            if response:
-                send_message(response)
+            if executor and isinstance(message, dict) and message.get("method") == "tools/call":
+                slots.acquire()
+                executor.submit(run_in_slot, message)
             else:
-                log("No response to send (notification)")
+                dispatch(message)
         
         log("MAIN LOOP ended normally")
     
@@ -328,6 +788,11 @@ def main():
         import traceback
         traceback.print_exc(file=sys.stderr)
         sys.exit(1)
+    finally:
+        if executor:
+            # Let in-flight calls finish and write their responses
+            executor.shutdown(wait=True)
+        shutdown_backtests()
     
     log("SERVER SHUTDOWN")
     log("=" * 60)
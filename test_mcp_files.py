@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Tests for mcp_files
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from mcp_files import DEFAULT_READ_LENGTH, AppendLogReader, ChunkedUploads, line_start_before, read_lines_since
+
+
+class ReadLinesSinceTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "log.txt"
+        self.path.write_bytes(b"[#1] first\n")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def append(self, data: bytes):
+        with open(self.path, 'ab') as f:
+            f.write(data)
+
+    def test_partial_line_is_held_back(self):
+        _, cursor = read_lines_since(self.path, 0)
+        since = cursor["next_offset"]
+
+        self.append(b"[#2] partial li")
+        data, cursor = read_lines_since(self.path, since)
+        self.assertEqual(data, b"")
+        self.assertEqual(cursor["next_offset"], since)
+
+        self.append(b"ne\n")
+        data, cursor = read_lines_since(self.path, cursor["next_offset"])
+        self.assertEqual(data, b"[#2] partial line\n")
+        self.assertTrue(cursor["eof"])
+
+    def test_unterminated_tail_is_released_once_quiet(self):
+        self.append(b"[#2] never terminated")
+        data, cursor = read_lines_since(self.path, 0, settle=60)
+        self.assertEqual(data, b"[#1] first\n")
+
+        since = cursor["next_offset"]
+        data, cursor = read_lines_since(self.path, since, settle=60)
+        self.assertEqual(data, b"")
+
+        os.utime(self.path, (time.time() - 120,) * 2)
+        data, cursor = read_lines_since(self.path, since, settle=60)
+        self.assertEqual(data, b"[#2] never terminated")
+        self.assertTrue(cursor["eof"])
+
+    def test_settle_zero_returns_tail_at_once(self):
+        self.append(b"[#2] tail")
+        data, cursor = read_lines_since(self.path, 0, settle=0)
+        self.assertEqual(data, b"[#1] first\n[#2] tail")
+        self.assertEqual(cursor["next_offset"], cursor["size"])
+
+    def test_line_start_before(self):
+        self.append(b"[#2] being writ")
+        size = self.path.stat().st_size
+        self.assertEqual(line_start_before(self.path, size), len(b"[#1] first\n"))
+        self.assertEqual(line_start_before(self.path, size, chunk=4), len(b"[#1] first\n"))
+        self.assertEqual(line_start_before(self.path, 5), 0)
+
+    def test_line_longer_than_max_bytes_is_split(self):
+        self.path.write_bytes(b"abcdefgh")
+        data, cursor = read_lines_since(self.path, 0, max_bytes=5)
+        self.assertEqual(data, b"abcde")
+        self.assertEqual(cursor["next_offset"], 5)
+
+
+class AppendLogReaderTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "out.txt"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_entry_longer_than_a_read_is_skipped_over(self):
+        first = b"# header\n[2024-01-01 00:00:00] [#1] short\n"
+        long_entry = b"[2024-01-01 00:00:01] [#2] " + b"x" * (DEFAULT_READ_LENGTH * 3 // 2) + b"\n"
+        # A [#N] lookalike where the second read of the long line starts is not an entry
+        long_entry = long_entry[:DEFAULT_READ_LENGTH] + b"[a] [#9] " + long_entry[DEFAULT_READ_LENGTH:]
+        last = b"[2024-01-01 00:00:02] [#3] after\n"
+        self.path.write_bytes(first + long_entry + last)
+
+        reader = AppendLogReader(self.path)
+        self.assertEqual(reader.offset_after(1), len(first))
+        self.assertEqual(reader.offset_after(2), len(first) + len(long_entry))
+        self.assertEqual(reader.offset_after(3), self.path.stat().st_size)
+
+    def test_unterminated_last_entry_is_not_returned_twice(self):
+        first = b"[2024-01-01 00:00:00] [#1] one\n"
+        self.path.write_bytes(first + b"[2024-01-01 00:00:01] [#2] no newline")
+        reader = AppendLogReader(self.path)
+        self.assertEqual(reader.offset_after(1), len(first))
+        self.assertEqual(reader.offset_after(2), self.path.stat().st_size)
+
+        with open(self.path, 'ab') as f:
+            f.write(b" yet\n[2024-01-01 00:00:02] [#3] three\n")
+        self.assertEqual(reader.offset_after(2), self.path.read_bytes().index(b"[2024-01-01 00:00:02]"))
+
+    def test_unnumbered_output_is_an_error(self):
+        self.path.write_bytes(b"# header\nplain reply without markers\n")
+        with self.assertRaises(ValueError):
+            AppendLogReader(self.path).offset_after(0)
+
+
+class ChunkedUploadsTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.uploads = ChunkedUploads(self.root / ".uploads", max_idle=60)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_abort_drops_staging_file(self):
+        self.uploads.write_chunk("u1", self.root / "out.txt", 0, "abc")
+        self.assertTrue((self.root / ".uploads" / "u1.part").exists())
+
+        self.assertTrue(self.uploads.abort("u1"))
+        self.assertFalse((self.root / ".uploads" / "u1.part").exists())
+        self.assertFalse(self.uploads.abort("u1"))
+        with self.assertRaises(ValueError):
+            self.uploads.write_chunk("u1", self.root / "out.txt", 1, "def")
+
+    def test_idle_uploads_expire(self):
+        # Left behind by an earlier process
+        (self.root / ".uploads").mkdir()
+        orphan = self.root / ".uploads" / "old.part"
+        orphan.write_text("x", encoding='utf-8')
+        os.utime(orphan, (time.time() - 120,) * 2)
+
+        self.uploads.write_chunk("idle", self.root / "a.txt", 0, "abc")
+        self.assertFalse(orphan.exists())
+        self.uploads._uploads["idle"]["touched"] -= 120
+
+        self.uploads.write_chunk("busy", self.root / "b.txt", 0, "abc")
+        self.assertEqual([p.name for p in (self.root / ".uploads").iterdir()], ["busy.part"])
+        self.assertFalse(self.uploads.abort("idle"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,29 +3,32 @@
 Thales MCP Server - Ultra Robust Windows Version
 """
 
-import json
 import os
 import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional
-from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+from contextlib import nullcontext
+
+from mcp_files import (
+    DEFAULT_READ_LENGTH, AppendLog, AppendLogReader, ChunkedUploads, DirectoryIndex,
+    line_start_before, read_lines_since, read_range, wait_for_file_change, write_text_file
+)
+from mcp_framing import FrameReader, FrameWriter
+from mcp_log import LogSink, Message
 
 # CRITICAL: Log to file for debugging
 LOG_FILE = Path(__file__).parent / "thales_debug.log"
 
-def log(message: str):
-    """Log to both stderr and file"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-    log_msg = f"[{timestamp}] [THALES] {message}\n"
-    
-    sys.stderr.write(log_msg)
-    sys.stderr.flush()
-    
-    try:
-        with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(log_msg)
-    except:
-        pass
+_log_sink = LogSink(LOG_FILE, "THALES")
+
+def log(message: Message):
+    """Log to both stderr and file (written by a background thread)"""
+    _log_sink.info(message)
+
+def debug(message: Message):
+    """Log only when MCP_LOG_LEVEL=DEBUG; pass a lambda to defer formatting"""
+    _log_sink.debug(message)
 
 # Log startup
 log("=" * 60)
@@ -39,6 +42,12 @@ WORKING_DIR = Path(__file__).parent / "mcp_sandbox"
 THALES_INPUT = WORKING_DIR / "THALES_INPUT.TXT"
 THALES_OUTPUT = WORKING_DIR / "THALES_OUTPUT.TXT"
 
+# THALES_INPUT.TXT rolls over to THALES_INPUT.0001.TXT, ... past this size
+try:
+    THALES_MAX_BYTES = int(os.environ.get("THALES_MAX_BYTES", 5 * 1024 * 1024))
+except ValueError:
+    THALES_MAX_BYTES = 5 * 1024 * 1024
+
 log(f"Working directory: {WORKING_DIR}")
 
 try:
@@ -60,6 +69,29 @@ try:
 except Exception as e:
     log(f"✗ Error in setup: {e}")
 
+# Upper bound for thales_wait; the server handles one request at a time
+THALES_MAX_WAIT = 120.0
+
+# Thales may never end its last entry with a newline: once the output file has
+# been quiet this long, incremental reads hand that unterminated line over too
+THALES_SETTLE_SECONDS = 1.0
+
+# Append-only writer for messages to Thales
+THALES_MAILBOX = AppendLog(
+    THALES_INPUT,
+    "# THALES_INPUT.TXT - Claude writes here\n",
+    max_bytes=THALES_MAX_BYTES
+)
+
+# Seq -> offset index over Thales replies, for thales_read since_seq
+THALES_REPLIES = AppendLogReader(THALES_OUTPUT)
+
+# Staging area for chunked write_file uploads
+UPLOADS = ChunkedUploads(WORKING_DIR / ".uploads")
+
+# Cached sandbox listing
+FILE_INDEX = DirectoryIndex(WORKING_DIR)
+
 # Tool definitions
 TOOLS = [
     {
@@ -69,7 +101,13 @@ TOOLS = [
             "type": "object",
             "properties": {
                 "filename": {"type": "string"},
-                "content": {"type": "string"}
+                "content": {"type": "string"},
+                "append": {"type": "boolean"},
+                "upload_id": {"type": "string"},
+                "chunk_index": {"type": "integer"},
+                "final": {"type": "boolean"},
+                "abort": {"type": "boolean"},
+                "fsync": {"type": "boolean"}
             },
             "required": ["filename", "content"]
         }
@@ -80,7 +118,9 @@ TOOLS = [
         "inputSchema": {
             "type": "object",
             "properties": {
-                "filename": {"type": "string"}
+                "filename": {"type": "string"},
+                "offset": {"type": "integer"},
+                "length": {"type": "integer"}
             },
             "required": ["filename"]
         }
@@ -88,7 +128,14 @@ TOOLS = [
     {
         "name": "list_files",
         "description": f"List files in {WORKING_DIR.resolve()}",
-        "inputSchema": {"type": "object", "properties": {}}
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "pattern": {"type": "string"},
+                "cursor": {"type": "string"},
+                "limit": {"type": "integer"}
+            }
+        }
     },
     {
         "name": "thales_write",
@@ -103,8 +150,30 @@ TOOLS = [
     },
     {
         "name": "thales_read",
-        "description": "Read Thales response",
-        "inputSchema": {"type": "object", "properties": {}}
+        "description": "Read Thales response (pass since / since_seq to get only new entries)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "since": {"type": "integer", "description": "Byte offset from a previous read's next cursor"},
+                "since_seq": {"type": "integer", "description": "Return entries after this [#seq] number (needs [#N] markers in the output)"},
+                "max_bytes": {"type": "integer"},
+                "final": {"type": "boolean", "description": "Also return a last line without a newline, even while Thales may still be writing it"}
+            }
+        }
+    },
+    {
+        "name": "thales_wait",
+        "description": f"Wait (up to timeout seconds, max {THALES_MAX_WAIT:g}) for new Thales output, then return it",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "since": {"type": "integer", "description": "Wait for output past this byte offset"},
+                "since_seq": {"type": "integer", "description": "Wait for entries after this [#seq] number (needs [#N] markers in the output)"},
+                "timeout": {"type": "number", "description": "Seconds to wait (default 30)"},
+                "max_bytes": {"type": "integer"},
+                "final": {"type": "boolean", "description": "Also return a last line without a newline, even while Thales may still be writing it"}
+            }
+        }
     },
     {
         "name": "thales_status",
@@ -130,6 +199,28 @@ def handle_list_tools() -> Dict[str, Any]:
     log("TOOLS/LIST called")
     return {"tools": TOOLS}
 
+def read_thales_since(since: int, max_bytes: Optional[int] = None, final: bool = False) -> Dict[str, Any]:
+    """Build a tool result with Thales output added after byte offset since"""
+    data, cursor = read_lines_since(
+        THALES_OUTPUT, since, DEFAULT_READ_LENGTH if max_bytes is None else int(max_bytes),
+        settle=0 if final else THALES_SETTLE_SECONDS
+    )
+    cursor["last_seq"] = AppendLogReader.last_seq(data)
+    content = data.decode('utf-8', errors='replace')
+    log(f"  Read Thales output bytes {cursor['offset']}-{cursor['next_offset']}")
+    
+    if content:
+        result = f"Thales Output (from {THALES_OUTPUT.resolve()}, new entries):\n\n{content}"
+    else:
+        result = "No new Thales output"
+    if cursor["reset"]:
+        result = "(output file was rewritten, reading from the start)\n" + result
+    result += f"\n\n[next: since={cursor['next_offset']}"
+    if cursor["last_seq"] is not None:
+        result += f", since_seq={cursor['last_seq']}"
+    result += "]"
+    return {"content": [{"type": "text", "text": result}], "_meta": {"cursor": cursor}}
+
 def handle_call_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
     """Handle tools/call"""
     log(f"TOOLS/CALL: {name}")
@@ -140,20 +231,64 @@ def handle_call_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
             if not message:
                 return {"content": [{"type": "text", "text": "Error: message required"}]}
             
-            existing = THALES_INPUT.read_text(encoding='utf-8')
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            new_line = f"[{timestamp}] {message}\n"
-            THALES_INPUT.write_text(existing + new_line, encoding='utf-8')
+            seq, timestamp = THALES_MAILBOX.append(message)
             
-            result = f"✓ Message sent to Thales at {timestamp}:\n{message}\n\nFile: {THALES_INPUT.resolve()}"
-            log(f"  Wrote to Thales")
-            return {"content": [{"type": "text", "text": result}]}
+            result = f"✓ Message #{seq} sent to Thales at {timestamp}:\n{message}\n\nFile: {THALES_INPUT.resolve()}"
+            log(f"  Wrote message #{seq} to Thales")
+            return {"content": [{"type": "text", "text": result}], "_meta": {"seq": seq}}
         
         elif name == "thales_read":
-            content = THALES_OUTPUT.read_text(encoding='utf-8')
-            result = f"Thales Output (from {THALES_OUTPUT.resolve()}):\n\n{content}"
-            log("  Read Thales output")
-            return {"content": [{"type": "text", "text": result}]}
+            since = arguments.get("since")
+            since_seq = arguments.get("since_seq")
+            
+            if since is None and since_seq is None:
+                content = THALES_OUTPUT.read_text(encoding='utf-8')
+                result = f"Thales Output (from {THALES_OUTPUT.resolve()}):\n\n{content}"
+                log("  Read Thales output")
+                return {"content": [{"type": "text", "text": result}]}
+            
+            # Incremental read: seek past what the caller already has
+            if since_seq is not None:
+                since = THALES_REPLIES.offset_after(int(since_seq))
+            return read_thales_since(int(since), arguments.get("max_bytes"), bool(arguments.get("final", False)))
+        
+        elif name == "thales_wait":
+            since = arguments.get("since")
+            since_seq = arguments.get("since_seq")
+            timeout = min(float(arguments.get("timeout", 30)), THALES_MAX_WAIT)
+            
+            final = bool(arguments.get("final", False))
+            settle = 0 if final else THALES_SETTLE_SECONDS
+            
+            if since_seq is not None:
+                since = THALES_REPLIES.offset_after(int(since_seq))
+            
+            if since is not None:
+                since = int(since)
+            elif THALES_OUTPUT.exists():
+                # Start at the entry being written, unless the file is already quiet
+                before = THALES_OUTPUT.stat()
+                since = before.st_size
+                if time.time() - before.st_mtime < THALES_SETTLE_SECONDS:
+                    since = line_start_before(THALES_OUTPUT, since)
+            else:
+                since = 0
+            
+            def changed(st) -> bool:
+                # Same rule as the read that follows: a whole new line (or a rewrite)
+                if st is None or st.st_size == since:
+                    return False
+                data, cursor = read_lines_since(THALES_OUTPUT, since, settle=settle)
+                return bool(data) or cursor["reset"]
+            
+            log(f"  Waiting up to {timeout}s for Thales output past byte {since}")
+            if not wait_for_file_change(THALES_OUTPUT, changed, timeout, recheck=THALES_SETTLE_SECONDS):
+                log("  Wait timed out")
+                return {
+                    "content": [{"type": "text", "text": f"No new Thales output after {timeout:g}s\n\n[next: since={since}]"}],
+                    "_meta": {"cursor": {"next_offset": since, "timeout": True}}
+                }
+            return read_thales_since(since, arguments.get("max_bytes"), final)
         
         elif name == "thales_status":
             input_exists = THALES_INPUT.exists()
@@ -183,8 +318,38 @@ OUTPUT: {THALES_OUTPUT.resolve()}
             if not filepath.resolve().is_relative_to(WORKING_DIR.resolve()):
                 return {"content": [{"type": "text", "text": "Error: Invalid filename"}]}
             
-            filepath.write_text(content, encoding='utf-8')
-            msg = f"✓ Wrote to {filepath.resolve()}"
+            upload_id = arguments.get("upload_id")
+            fsync = bool(arguments.get("fsync", False))
+            
+            if upload_id and arguments.get("abort"):
+                if not UPLOADS.abort(str(upload_id)):
+                    return {"content": [{"type": "text", "text": f"Error: Unknown upload '{upload_id}'"}]}
+                msg = f"✓ Upload '{upload_id}' aborted"
+                log(f"  {msg}")
+                return {"content": [{"type": "text", "text": msg}]}
+            
+            if upload_id:
+                final = bool(arguments.get("final", False))
+                with FILE_INDEX.tracking(filepath) if final else nullcontext():
+                    status = UPLOADS.write_chunk(
+                        str(upload_id),
+                        filepath,
+                        int(arguments.get("chunk_index", 0)),
+                        content,
+                        final=final,
+                        fsync=fsync
+                    )
+                if status["complete"]:
+                    msg = f"✓ Wrote to {filepath.resolve()} ({status['chunks']} chunks)"
+                else:
+                    msg = f"✓ Upload '{upload_id}': {status['chunks']} chunks received"
+                log(f"  {msg}")
+                return {"content": [{"type": "text", "text": msg}], "_meta": {"upload": status}}
+            
+            append = bool(arguments.get("append", False))
+            with FILE_INDEX.tracking(filepath):
+                write_text_file(filepath, content, append=append, fsync=fsync)
+            msg = f"✓ {'Appended to' if append else 'Wrote to'} {filepath.resolve()}"
             log(f"  {msg}")
             return {"content": [{"type": "text", "text": msg}]}
         
@@ -202,12 +367,38 @@ OUTPUT: {THALES_OUTPUT.resolve()}
             if not filepath.exists():
                 return {"content": [{"type": "text", "text": f"Error: '{filename}' not found"}]}
             
-            content = filepath.read_text(encoding='utf-8')
-            log(f"  Read {len(content)} chars")
-            return {"content": [{"type": "text", "text": content}]}
+            offset = arguments.get("offset")
+            length = arguments.get("length")
+            
+            if offset is None and length is None:
+                content = filepath.read_text(encoding='utf-8')
+                log(f"  Read {len(content)} chars")
+                return {"content": [{"type": "text", "text": content}]}
+            
+            content, cursor = read_range(
+                filepath,
+                int(offset or 0),
+                DEFAULT_READ_LENGTH if length is None else int(length)
+            )
+            log(f"  Read bytes {cursor['offset']}-{cursor['next_offset']}")
+            status = f"[bytes {cursor['offset']}-{cursor['next_offset']} of {cursor['size']}"
+            status += ", end of file]" if cursor["eof"] else f", next offset={cursor['next_offset']}]"
+            return {
+                "content": [
+                    {"type": "text", "text": content},
+                    {"type": "text", "text": status}
+                ],
+                "_meta": {"cursor": cursor}
+            }
         
         elif name == "list_files":
-            files = [f.name for f in WORKING_DIR.iterdir() if f.is_file()]
+            limit = arguments.get("limit")
+            entries, next_cursor = FILE_INDEX.list(
+                pattern=arguments.get("pattern"),
+                cursor=arguments.get("cursor"),
+                limit=int(limit) if limit is not None else None
+            )
+            files = [e["name"] for e in entries]
             
             if files:
                 thales = [f for f in files if f.upper() in ["THALES_INPUT.TXT", "THALES_OUTPUT.TXT"]]
@@ -222,10 +413,13 @@ OUTPUT: {THALES_OUTPUT.resolve()}
                 if regular:
                     msg += "\n\n📄 Regular Files:\n"
                     msg += "\n".join(f"   • {f}" for f in sorted(regular))
+                
+                if next_cursor:
+                    msg += f"\n\n[more: cursor={next_cursor!r}]"
             else:
                 msg = f"No files in {WORKING_DIR.resolve()}"
             
-            return {"content": [{"type": "text", "text": msg}]}
+            return {"content": [{"type": "text", "text": msg}], "_meta": {"next_cursor": next_cursor}}
         
         else:
             return {"content": [{"type": "text", "text": f"Unknown tool: {name}"}]}
@@ -236,7 +430,7 @@ OUTPUT: {THALES_OUTPUT.resolve()}
         traceback.print_exc(file=sys.stderr)
         return {"content": [{"type": "text", "text": f"Error: {str(e)}"}]}
 
-def process_request(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def process_single(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Process request"""
     method = request.get("method")
     params = request.get("params", {})
@@ -288,47 +482,95 @@ def process_request(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
             }
         }
 
-def send_message(message: Dict[str, Any]):
+def describe_message(message: Any) -> str:
+    """Short summary of a message or batch for the log"""
+    if isinstance(message, list):
+        ids = [m.get("id") for m in message if isinstance(m, dict)]
+        return f"batch of {len(message)}, ids={ids}"
+    if isinstance(message, dict):
+        return f"method={message.get('method')}, id={message.get('id')}"
+    return f"invalid message: {type(message).__name__}"
+
+def invalid_request(request_id: Any = None) -> Dict[str, Any]:
+    """Build error for a non-request message"""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {
+            "code": -32600,
+            "message": "Invalid Request"
+        }
+    }
+
+def process_batch(requests: List[Any]) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Process batch in order (keeps thales_write messages ordered)"""
+    log(f"BATCH: {len(requests)} requests")
+    
+    if not requests:
+        return invalid_request()
+    
+    responses = [process_batch_item(r) for r in requests]
+    responses = [r for r in responses if r]
+    return responses or None
+
+def process_batch_item(request: Any) -> Optional[Dict[str, Any]]:
+    """Process one batch entry (nested batches are invalid)"""
+    if not isinstance(request, dict):
+        return invalid_request()
+    return process_single(request)
+
+def process_request(request: Any) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Process request object or batch array"""
+    if isinstance(request, list):
+        return process_batch(request)
+    if not isinstance(request, dict):
+        return invalid_request()
+    return process_single(request)
+
+def parse_error() -> Dict[str, Any]:
+    """Build error for a message that could not be parsed"""
+    return {
+        "jsonrpc": "2.0",
+        "id": None,
+        "error": {
+            "code": -32700,
+            "message": "Parse error"
+        }
+    }
+
+# Binary stdio: NDJSON or Content-Length requests in, NDJSON replies out
+_frames_in = FrameReader(sys.stdin.buffer)
+_frames_out = FrameWriter(sys.stdout.buffer)
+
+def send_message(message: Union[Dict[str, Any], List[Dict[str, Any]]]):
     """Send message"""
     try:
-        json_str = json.dumps(message)
-        sys.stdout.write(json_str + '\n')
-        sys.stdout.flush()
-        
-        log(f"SENT response id={message.get('id')}")
+        _frames_out.write_message(message)
+        log(f"SENT response {describe_message(message)}")
     except Exception as e:
         log(f"ERROR sending: {e}")
 
-def read_message() -> Optional[Dict[str, Any]]:
-    """Read message"""
-    try:
-        # Read first line
-        first_line = sys.stdin.readline().strip()
-        if not first_line:
-            log("EOF")
+def read_message() -> Optional[Any]:
+    """Read message (object or batch array), NDJSON or Content-Length framed"""
+    while True:
+        try:
+            message = _frames_in.read_message()
+        except ValueError as e:
+            # Bad frame already skipped: report it and keep reading
+            log(f"ERROR parsing: {e}")
+            send_message(parse_error())
+            continue
+        except Exception as e:
+            log(f"ERROR reading: {e}")
             return None
         
-        log(f"READ: {first_line[:80]}...")
-        
-        # Check format
-        if "Content-Length:" in first_line:
-            # Standard MCP format
-            content_length = int(first_line.split(":", 1)[1].strip())
-            sys.stdin.readline()  # empty line
-            content = sys.stdin.read(content_length)
-            if not content:
-                return None
-            message = json.loads(content)
-        else:
-            # Direct JSON format
-            message = json.loads(first_line)
+        if message is None:
+            log("EOF")
+            return None
         
-        log(f"RECEIVED: method={message.get('method')}, id={message.get('id')}")
+        debug(lambda: f"READ {_frames_in.last_framing} message")
+        log(f"RECEIVED: {describe_message(message)}")
         return message
-    
-    except Exception as e:
-        log(f"ERROR reading: {e}")
-        return None
 
 def main():
     """Main loop"""
@@ -338,7 +580,7 @@ def main():
         iteration = 0
         while True:
             iteration += 1
-            log(f"--- Iteration {iteration} ---")
+            debug(f"--- Iteration {iteration} ---")
             
             message = read_message()
             if message is None: